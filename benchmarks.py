@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the scraping and chunking hot paths.
+
+Usage:
+    python benchmarks.py comment_tree [--nodes 20000]
+    python benchmarks.py level2_context [--comments 2000]
+    python benchmarks.py parallel_chunking [--posts 2000] [--workers 4]
+    python benchmarks.py text_normalizer [--corpus hierarchical_chunks.json ...]
+    python benchmarks.py query_plans [--min-score 3]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from types import SimpleNamespace
+
+
+def best_of(func, repeat: int = 5) -> float:
+    """Return the fastest wall time of several runs of func, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+# ---------------------------------------------------------------------------
+# Comment tree flattening
+# ---------------------------------------------------------------------------
+
+def make_comment(comment_id: int, parent_fullname: str) -> SimpleNamespace:
+    """Create a PRAW-like comment object."""
+    return SimpleNamespace(
+        id=f"c{comment_id}",
+        body=f"Synthetic comment {comment_id} " * 8,
+        author=f"user{comment_id % 500}",
+        score=random.randint(-5, 200),
+        created_utc=1700000000 + comment_id,
+        parent_id=parent_fullname,
+        permalink=f"/r/mindfulness/comments/p1/_/c{comment_id}/",
+        replies=[]
+    )
+
+
+def make_bushy_forest(total_nodes: int, max_children: int = 6, seed: int = 42) -> list:
+    """Build a comment forest shaped like a busy thread: many top-level comments, short reply chains."""
+    random.seed(seed)
+    forest = []
+    open_parents = []
+    for comment_id in range(total_nodes):
+        if not open_parents or random.random() < 0.2:
+            comment = make_comment(comment_id, "t3_p1")
+            forest.append(comment)
+        else:
+            parent = random.choice(open_parents)
+            comment = make_comment(comment_id, f"t1_{parent.id}")
+            parent.replies.append(comment)
+            if len(parent.replies) >= max_children:
+                open_parents.remove(parent)
+        open_parents.append(comment)
+    return forest
+
+
+def make_deep_chain(depth: int) -> list:
+    """Build a single reply chain, depth comments deep."""
+    root = make_comment(0, "t3_p1")
+    current = root
+    for comment_id in range(1, depth):
+        reply = make_comment(comment_id, f"t1_{current.id}")
+        current.replies.append(reply)
+        current = reply
+    return [root]
+
+
+def reference_comment_row(scraper, comment, post_id: str):
+    """The previous per-comment row builder, kept here as the baseline."""
+    if not hasattr(comment, 'body') or comment.body in ['[deleted]', '[removed]']:
+        return None
+
+    parent_type = 'post'
+    parent_id = post_id
+    if hasattr(comment, 'parent_id') and comment.parent_id:
+        parent_id_str = str(comment.parent_id)
+        if parent_id_str.startswith('t1_'):
+            parent_type = 'comment'
+            parent_id = parent_id_str[3:]
+        elif parent_id_str.startswith('t3_'):
+            parent_id = parent_id_str[3:]
+
+    return {
+        'id': comment.id,
+        'post_id': post_id,
+        'author': scraper.safe_get_attribute(comment, 'author'),
+        'body': comment.body,
+        'score': scraper.safe_get_attribute(comment, 'score', 0),
+        'created_utc': scraper.convert_utc_timestamp(comment.created_utc),
+        'parent_type': parent_type,
+        'parent_id': parent_id,
+        'permalink': scraper.safe_get_attribute(comment, 'permalink')
+    }
+
+
+def recursive_reference(scraper, comment_forest, post_id: str, rows: list) -> list:
+    """The previous recursive traversal: one row dict per comment, one Python frame per reply level."""
+    for comment in comment_forest:
+        comment_data = reference_comment_row(scraper, comment, post_id)
+        if comment_data is not None:
+            rows.append(comment_data)
+        if comment.replies:
+            recursive_reference(scraper, comment.replies, post_id, rows)
+    return rows
+
+
+def bench_comment_tree(nodes: int):
+    """Compare recursive row building with the breadth-first CommentBatch flattener."""
+    from reddit_scraper import RedditScraper
+
+    scraper = RedditScraper("mindfulness")
+    print(f"=== Comment tree flattening ({nodes} nodes) ===")
+
+    forest = make_bushy_forest(nodes)
+    recursive_time = best_of(lambda: recursive_reference(scraper, forest, "p1", []))
+    flatten_time = best_of(lambda: scraper.flatten_comment_forest(forest, "p1"))
+    print(f"Bushy thread  recursive dict rows: {recursive_time * 1000:8.1f} ms")
+    print(f"Bushy thread  flatten to batch:    {flatten_time * 1000:8.1f} ms "
+          f"({recursive_time / flatten_time:.2f}x)")
+
+    params_time = best_of(lambda: scraper.flatten_comment_forest(forest, "p1").insert_params())
+    print(f"Bushy thread  flatten + params:    {params_time * 1000:8.1f} ms")
+
+    chain_depth = max(nodes // 4, sys.getrecursionlimit() * 2)
+    chain = make_deep_chain(chain_depth)
+    try:
+        recursive_reference(scraper, chain, "p1", [])
+        print(f"Deep chain ({chain_depth} levels) recursive: ok")
+    except RecursionError:
+        print(f"Deep chain ({chain_depth} levels) recursive: RecursionError")
+    chain_time = best_of(lambda: scraper.flatten_comment_forest(chain, "p1"), repeat=3)
+    print(f"Deep chain ({chain_depth} levels) flatten:   {chain_time * 1000:8.1f} ms")
+
+
+# ---------------------------------------------------------------------------
+# Level 2 reply context
+# ---------------------------------------------------------------------------
+
+def make_thread_post(num_comments: int, seed: int = 42) -> dict:
+    """Build an extracted post dict with num_comments comment rows, about two thirds of them replies."""
+    random.seed(seed)
+    comments = []
+    for i in range(num_comments):
+        if i == 0 or random.random() < 0.33:
+            parent_type, parent_id = "post", "p1"
+        else:
+            parent_type, parent_id = "comment", comments[random.randrange(i)]["id"]
+        comments.append({
+            "id": f"c{i}",
+            "author": f"user{i % 500}",
+            "body": f"Synthetic **reply** number {i} with enough words to pass the length filter. " * 3,
+            "score": random.randint(-5, 200),
+            "created_utc": None,
+            "parent_type": parent_type,
+            "parent_id": parent_id,
+            "permalink": f"/r/mindfulness/comments/p1/_/c{i}/"
+        })
+    return {"id": "p1", "title": "A big thread", "comments": comments}
+
+
+def linear_parent_reference(chunker, posts_data: list) -> int:
+    """The previous Level 2 context lookup: a linear scan of the post's comments for every reply."""
+    built = 0
+    for post in posts_data:
+        post_title = chunker.clean_text(post.get("title", ""))
+        for comment in post.get("comments", []):
+            comment_text = chunker.clean_text(comment.get("body", ""))
+            if not comment_text or len(comment_text) < 20:
+                continue
+            content = f"Post Context: {post_title}\n\n"
+            if comment.get("parent_type") == "comment":
+                parent_comment = next(
+                    (c for c in post.get("comments", []) if c["id"] == comment.get("parent_id")),
+                    None
+                )
+                if parent_comment:
+                    content += f"Replying to: {chunker.clean_text(parent_comment.get('body', ''))[:200]}\n\n"
+            content += f"Comment: {comment_text}\n\n"
+            built += 1
+    return built
+
+
+def bench_level2_context(num_comments: int):
+    """Compare linear parent lookup with the per-post index in create_level2_chunks."""
+    from data_extractor import HierarchicalChunker
+
+    print(f"=== Level 2 reply context ({num_comments}-comment thread) ===")
+    posts_data = [make_thread_post(num_comments)]
+
+    chunker = HierarchicalChunker()
+    linear_time = best_of(lambda: linear_parent_reference(chunker, posts_data), repeat=3)
+    indexed_time = best_of(lambda: chunker.create_level2_chunks(posts_data), repeat=3)
+    print(f"Linear parent scan:       {linear_time * 1000:8.1f} ms")
+    print(f"Indexed parent lookup:    {indexed_time * 1000:8.1f} ms ({linear_time / indexed_time:.1f}x)")
+
+    deep_chunker = HierarchicalChunker(context_depth=3)
+    deep_time = best_of(lambda: deep_chunker.create_level2_chunks(posts_data), repeat=3)
+    print(f"Indexed, 3 ancestors:     {deep_time * 1000:8.1f} ms")
+
+
+# ---------------------------------------------------------------------------
+# Parallel L1/L2 chunking
+# ---------------------------------------------------------------------------
+
+def bench_parallel_chunking(num_posts: int, workers: int):
+    """Compare serial chunking with process-pool sharding in iter_batch_chunks."""
+    from concurrent.futures import ProcessPoolExecutor
+    from data_extractor import HierarchicalChunker
+
+    print(f"=== Parallel chunking ({num_posts} posts, {workers} workers) ===")
+    posts_data = []
+    for i in range(num_posts):
+        post = make_thread_post(60, seed=i)
+        post["id"] = f"p{i}"
+        post["selftext"] = "Long **post** body about sitting with difficult feelings. " * 20
+        posts_data.append(post)
+
+    chunker = HierarchicalChunker()
+    serial_time = best_of(lambda: list(chunker.iter_batch_chunks(posts_data)), repeat=3)
+    print(f"Serial:             {serial_time * 1000:8.1f} ms")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        list(chunker.iter_batch_chunks(posts_data[:workers], executor, shard_size=1))  # Start the workers
+        parallel_time = best_of(lambda: list(chunker.iter_batch_chunks(posts_data, executor)), repeat=3)
+        same = list(chunker.iter_batch_chunks(posts_data, executor)) == list(chunker.iter_batch_chunks(posts_data))
+    print(f"{workers} processes:        {parallel_time * 1000:8.1f} ms ({serial_time / parallel_time:.2f}x)")
+    print(f"Same output and order: {same}")
+
+
+# ---------------------------------------------------------------------------
+# Text normalization
+# ---------------------------------------------------------------------------
+
+def chunk_clean_reference(text: str) -> str:
+    """The previous HierarchicalChunker.clean_text."""
+    if not text:
+        return ""
+    text = text.replace('**', '').replace('*', '')
+    text = text.replace('\n\n', '\n').replace('\r', '')
+    text = ' '.join(text.split())
+    return text.strip()
+
+
+def topic_clean_reference(text: str) -> str:
+    """The previous MindfulnessTopicDiscovery.clean_text (same in summarize.py)."""
+    if not text:
+        return ""
+    text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
+    text = re.sub(r'/u/\w+', '', text)
+    text = re.sub(r'/r/\w+', '', text)
+    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
+    text = re.sub(r'\*([^*]+)\*', r'\1', text)
+    text = re.sub(r'\n+', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def fast_clean_reference(text: str) -> str:
+    """The previous FastMindfulnessTopicDiscovery.clean_text_fast."""
+    if not text:
+        return ""
+    text = re.sub(r'http[s]?://\S+', '', text)
+    text = re.sub(r'/[ur]/\w+', '', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def load_corpus_texts(paths: list) -> list:
+    """Collect 'content' / 'text' fields from JSON or NDJSON chunk and document files."""
+    texts = []
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"Skipping missing corpus file {path}")
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()] if path.endswith(".ndjson") else json.load(f)
+        texts.extend(record.get("content") or record.get("text") or "" for record in records)
+    return texts
+
+
+def bench_text_normalizer(corpus_paths: list, repeat: int):
+    """Compare the previous clean_text copies with the shared text_normalizer profiles."""
+    from text_normalizer import normalize, normalize_batch
+
+    texts = load_corpus_texts(corpus_paths)
+    # Chunk contents are already cleaned; put back the kind of markdown, links and line breaks the cleaners remove
+    texts += [text.replace(". ", ".\r\n\n") + " **Edit:** see https://www.reddit.com/r/Meditation/ by /u/someone *thanks*"
+              for text in texts[:len(texts) // 2]]
+    total_chars = sum(len(text) for text in texts)
+    print(f"=== Text normalization ({len(texts)} texts, {total_chars / 1e6:.1f} M chars) ===")
+
+    for profile, reference in (("chunk", chunk_clean_reference),
+                               ("topic", topic_clean_reference),
+                               ("fast", fast_clean_reference)):
+        old_time = best_of(lambda: [reference(text) for text in texts], repeat=repeat)
+        single_time = best_of(lambda: [normalize(text, profile) for text in texts], repeat=repeat)
+        batch_time = best_of(lambda: normalize_batch(texts, profile), repeat=repeat)
+        new_output = normalize_batch(texts, profile)
+        same = sum(reference(text) == cleaned for text, cleaned in zip(texts, new_output))
+        print(f"{profile:5s}  previous {old_time * 1000:7.1f} ms | normalize {single_time * 1000:7.1f} ms "
+              f"({old_time / single_time:.2f}x) | batch {batch_time * 1000:7.1f} ms ({old_time / batch_time:.2f}x) "
+              f"| identical output {same}/{len(texts)}")
+
+
+# ---------------------------------------------------------------------------
+# Extractor query plans
+# ---------------------------------------------------------------------------
+
+def extractor_queries(min_score: int, post_ids: list) -> list:
+    """(name, query, params) for the extractor and topic-script access paths, as they filter and sort."""
+    from data_extractor import HIGH_VALUE_COMMENTS_QUERY
+
+    return [
+        ("extract_posts_with_comments", """
+            SELECT id, title, selftext FROM posts
+            WHERE title IS NOT NULL
+            ORDER BY score DESC, created_utc DESC LIMIT 100
+        """, ()),
+        ("fetch_comments_for_posts", f"""
+            SELECT post_id, id, body FROM comments
+            WHERE post_id IN ({', '.join(['%s'] * len(post_ids))})
+            AND is_deleted = 0
+            ORDER BY post_id, score DESC, created_utc ASC
+        """, tuple(post_ids)),
+        ("get_high_value_comments", HIGH_VALUE_COMMENTS_QUERY, (min_score,)),
+        ("summarizer_fast top comments", """
+            SELECT c.id, c.body, p.title FROM comments c
+            JOIN posts p ON c.post_id = p.id
+            WHERE c.is_deleted = 0
+            AND c.body_length >= 20
+            ORDER BY c.score DESC LIMIT 10000
+        """, ()),
+    ]
+
+
+def bench_query_plans(min_score: int):
+    """Print EXPLAIN for each extractor query: access type, index and whether MySQL sorts."""
+    from db import get_pool
+
+    print("=== Extractor query plans ===")
+    with get_pool().cursor(dictionary=True) as cursor:
+        # One keyset page of posts, as main_batch_processing fetches them
+        cursor.execute("SELECT id FROM posts ORDER BY created_utc, id LIMIT 100")
+        post_ids = [row['id'] for row in cursor.fetchall()] or ['']
+
+        for name, query, params in extractor_queries(min_score, post_ids):
+            cursor.execute("EXPLAIN " + query, params)
+            print(f"\n{name}")
+            for row in cursor.fetchall():
+                print(f"  {str(row['table']):10s} type={str(row['type']):6s} key={row['key']} "
+                      f"rows={row['rows']} extra={row['Extra']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    comment_tree = subparsers.add_parser("comment_tree", help="Comment forest flattening")
+    comment_tree.add_argument("--nodes", type=int, default=20000)
+
+    level2_context = subparsers.add_parser("level2_context", help="Level 2 chunk parent lookup")
+    level2_context.add_argument("--comments", type=int, default=2000)
+
+    parallel_chunking = subparsers.add_parser("parallel_chunking", help="Process-pool L1/L2 chunking")
+    parallel_chunking.add_argument("--posts", type=int, default=2000)
+    parallel_chunking.add_argument("--workers", type=int, default=4)
+
+    text_normalizer = subparsers.add_parser("text_normalizer", help="clean_text variants vs text_normalizer")
+    text_normalizer.add_argument("--corpus", nargs="+",
+                                 default=["hierarchical_chunks.json",
+                                          "mindfulness_topics_document_mappings_20250529_112124.json"])
+    text_normalizer.add_argument("--repeat", type=int, default=5)
+
+    query_plans = subparsers.add_parser("query_plans", help="EXPLAIN the extractor queries (needs the database)")
+    query_plans.add_argument("--min-score", type=int, default=3)
+
+    args = parser.parse_args()
+    if args.benchmark == "comment_tree":
+        bench_comment_tree(args.nodes)
+    elif args.benchmark == "level2_context":
+        bench_level2_context(args.comments)
+    elif args.benchmark == "parallel_chunking":
+        bench_parallel_chunking(args.posts, args.workers)
+    elif args.benchmark == "text_normalizer":
+        bench_text_normalizer(args.corpus, args.repeat)
+    elif args.benchmark == "query_plans":
+        bench_query_plans(args.min_score)
+
+
+if __name__ == "__main__":
+    main()
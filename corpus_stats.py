@@ -0,0 +1,228 @@
+"""
+Materialized corpus statistics.
+
+Triggers in schema.sql keep three tables current as rows are inserted:
+
+    corpus_stats         counts, length and score aggregates per table, spread
+                         over STATS_SLOTS rows so parallel writers don't queue
+                         on one hot row; readers sum the slots
+    author_activity      posts and non-deleted comments per author
+    post_comment_counts  stored comments per post
+
+Reading them takes milliseconds regardless of corpus size. Triggers only see
+inserts and score updates, so after deleting rows run a full rebuild, with the
+writers stopped:
+
+    python corpus_stats.py --rebuild
+
+The first read after schema.sql installs the triggers rebuilds automatically:
+corpus_stats_state holds a marker that only a rebuild sets and that installing
+the triggers clears.
+"""
+
+import logging
+import math
+from typing import Dict, List, Optional
+
+from db import get_db_config, get_pool
+
+logger = logging.getLogger(__name__)
+
+# Must match the CONNECTION_ID() % 16 in the schema.sql triggers
+STATS_SLOTS = 16
+
+# A comment that counts towards lengths, scores and author activity
+VALID_COMMENT = "(body IS NOT NULL AND body NOT IN ('[deleted]', '[removed]'))"
+
+STATS_COLUMNS = ('table_name', 'slot', 'row_count', 'valid_count', 'length_sum', 'length_min', 'length_max',
+                 'score_sum', 'score_sq_sum', 'score_min', 'score_max')
+
+REBUILD_QUERIES = [
+    "DELETE FROM corpus_stats",
+    f"""
+    INSERT INTO corpus_stats ({', '.join(STATS_COLUMNS)})
+    SELECT
+        'posts', 0, COUNT(*), COUNT(*),
+        COALESCE(SUM(CHAR_LENGTH(title) + CHAR_LENGTH(COALESCE(selftext, ''))), 0),
+        MIN(CHAR_LENGTH(title) + CHAR_LENGTH(COALESCE(selftext, ''))),
+        MAX(CHAR_LENGTH(title) + CHAR_LENGTH(COALESCE(selftext, ''))),
+        COALESCE(SUM(score), 0), COALESCE(SUM(score * score), 0), MIN(score), MAX(score)
+    FROM posts
+    """,
+    f"""
+    INSERT INTO corpus_stats ({', '.join(STATS_COLUMNS)})
+    SELECT
+        'comments', 0, COUNT(*), COALESCE(SUM({VALID_COMMENT}), 0),
+        COALESCE(SUM(IF({VALID_COMMENT}, CHAR_LENGTH(body), 0)), 0),
+        MIN(IF({VALID_COMMENT}, CHAR_LENGTH(body), NULL)),
+        MAX(IF({VALID_COMMENT}, CHAR_LENGTH(body), NULL)),
+        COALESCE(SUM(IF({VALID_COMMENT}, score, 0)), 0),
+        COALESCE(SUM(IF({VALID_COMMENT}, score * score, 0)), 0),
+        MIN(IF({VALID_COMMENT}, score, NULL)),
+        MAX(IF({VALID_COMMENT}, score, NULL))
+    FROM comments
+    """,
+    "DELETE FROM author_activity",
+    f"""
+    INSERT INTO author_activity (author, post_count, comment_count)
+    SELECT author, SUM(is_post), SUM(1 - is_post)
+    FROM (
+        SELECT author, 1 AS is_post FROM posts WHERE author IS NOT NULL
+        UNION ALL
+        SELECT author, 0 AS is_post FROM comments WHERE author IS NOT NULL AND {VALID_COMMENT}
+    ) combined
+    GROUP BY author
+    """,
+    "DELETE FROM post_comment_counts",
+    """
+    INSERT INTO post_comment_counts (post_id, comment_count)
+    SELECT post_id, COUNT(*) FROM comments WHERE post_id IS NOT NULL GROUP BY post_id
+    """,
+    "REPLACE INTO corpus_stats_state (id, built_at) VALUES (1, NOW())"
+]
+
+
+def rebuild_corpus_stats(connection):
+    """
+    Recompute every stats table from posts and comments in one transaction.
+
+    This is the only full scan; run it to backfill and after deleting rows.
+    """
+    cursor = connection.cursor()
+    try:
+        for query in REBUILD_QUERIES:
+            cursor.execute(query)
+        connection.commit()
+        logger.info("Corpus statistics rebuilt")
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def read_corpus_stats(connection) -> Optional[Dict[str, Dict]]:
+    """
+    Return the summed stats per table, or None if they were never built.
+
+    Returns:
+        'posts' and 'comments' -> row_count, valid_count and, over valid rows,
+        length and score avg/max/min (score std is the population stddev, as
+        MySQL STDDEV)
+    """
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT
+                table_name, SUM(row_count) AS row_count, SUM(valid_count) AS valid_count,
+                SUM(length_sum) AS length_sum, MIN(length_min) AS length_min, MAX(length_max) AS length_max,
+                SUM(score_sum) AS score_sum, SUM(score_sq_sum) AS score_sq_sum,
+                MIN(score_min) AS score_min, MAX(score_max) AS score_max
+            FROM corpus_stats
+            GROUP BY table_name
+        """)
+        rows = {row['table_name']: row for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+    if 'posts' not in rows or 'comments' not in rows:
+        return None
+
+    stats = {}
+    for table_name, row in rows.items():
+        valid = int(row['valid_count'] or 0)
+        mean_score = float(row['score_sum']) / valid if valid else None
+        stats[table_name] = {
+            'row_count': int(row['row_count']),
+            'valid_count': valid,
+            'length': {
+                'avg': float(row['length_sum']) / valid if valid else None,
+                'max': row['length_max'],
+                'min': row['length_min']
+            },
+            'score': {
+                'avg': mean_score,
+                'max': row['score_max'],
+                'min': row['score_min'],
+                'std': math.sqrt(max(float(row['score_sq_sum']) / valid - mean_score ** 2, 0.0)) if valid else None
+            }
+        }
+    return stats
+
+
+def corpus_stats_built(connection) -> bool:
+    """Whether the stats tables have been rebuilt since the triggers were installed."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT 1 FROM corpus_stats_state WHERE id = 1")
+        return cursor.fetchone() is not None
+    finally:
+        cursor.close()
+
+
+def ensure_corpus_stats(connection) -> Dict[str, Dict]:
+    """read_corpus_stats, rebuilding the tables first if they were never built."""
+    stats = None
+    if corpus_stats_built(connection):
+        stats = read_corpus_stats(connection)
+    if stats is None:
+        logger.info("Corpus statistics were never built; building them once from posts and comments")
+        rebuild_corpus_stats(connection)
+        stats = read_corpus_stats(connection)
+    return stats
+
+
+def get_top_authors(connection, limit: int = 10) -> List[Dict]:
+    """Most active authors: posts plus non-deleted comments."""
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT author, activity_count
+            FROM author_activity
+            ORDER BY activity_count DESC
+            LIMIT %s
+        """, (limit,))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def get_top_commented_posts(connection, limit: int = 10) -> List[tuple]:
+    """(post id, reported num_comments, stored comments) for the posts with most stored comments."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT p.id, p.num_comments AS reported_comments, pc.comment_count AS actual_comments
+            FROM post_comment_counts pc
+            JOIN posts p ON p.id = pc.post_id
+            ORDER BY pc.comment_count DESC
+            LIMIT %s
+        """, (limit,))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def main():
+    """Print the corpus statistics, optionally rebuilding them first."""
+    import argparse
+    import json
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Show or rebuild the materialized corpus statistics")
+    parser.add_argument('--rebuild', action='store_true', help='Recompute from posts and comments (full scan)')
+    args = parser.parse_args()
+
+    with get_pool(get_db_config()).connection() as connection:
+        if args.rebuild:
+            rebuild_corpus_stats(connection)
+        print(json.dumps({
+            'stats': ensure_corpus_stats(connection),
+            'top_authors': get_top_authors(connection),
+            'top_commented_posts': get_top_commented_posts(connection)
+        }, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,80 @@
-import mysql.connector
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator
 import logging
 from datetime import datetime
 import json
+import os
+import re
+import sys
+import hashlib
+import random
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from db import get_db_config, get_pool
+from corpus_stats import ensure_corpus_stats, get_top_commented_posts
+from text_normalizer import normalize
+
+try:
+    from transformers import AutoTokenizer
+except ImportError:  # Tokenizer budgets are optional; the chunker falls back to estimates
+    AutoTokenizer = None
+
+try:
+    from huggingface_hub import hf_hub_download
+except ImportError:  # Only needed to read max_seq_length of hub models
+    hf_hub_download = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Tokenizers loaded in this process, shared by all chunkers (and by pool workers across tasks)
+_TOKENIZERS = {}
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# Written next to the tokenizer files of SentenceTransformer models
+SENTENCE_BERT_CONFIG = 'sentence_bert_config.json'
+
+def load_tokenizer(name: str):
+    """Load a fast Hugging Face tokenizer once per process."""
+    if name not in _TOKENIZERS:
+        if AutoTokenizer is None:
+            raise ImportError("transformers is required for tokenizer budgets: pip install transformers")
+        _TOKENIZERS[name] = AutoTokenizer.from_pretrained(name, use_fast=True)
+        logger.info(f"Loaded tokenizer {name} (model max length {_TOKENIZERS[name].model_max_length})")
+    return _TOKENIZERS[name]
+
+def load_max_seq_length(name: str) -> Optional[int]:
+    """
+    max_seq_length of a SentenceTransformer model, or None if it has no sentence_bert_config.json.
+    
+    SentenceTransformer truncates at this length, which is usually shorter than
+    the tokenizer's model_max_length (256 vs 512 for the MiniLM models).
+    """
+    path = os.path.join(name, SENTENCE_BERT_CONFIG)
+    if not os.path.isfile(path):
+        if hf_hub_download is None:
+            return None
+        try:
+            path = hf_hub_download(name, SENTENCE_BERT_CONFIG)
+        except Exception:
+            return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('max_seq_length')
+
+HIGH_VALUE_COMMENTS_QUERY = """
+    SELECT 
+        c.id, c.author, c.body, c.score, c.created_utc, 
+        c.parent_type, c.parent_id, c.permalink, c.post_id,
+        p.title as post_title, p.author as post_author
+    FROM comments c
+    JOIN posts p ON c.post_id = p.id
+    WHERE c.is_deleted = 0
+    AND c.score >= %s
+    ORDER BY c.score DESC, c.created_utc DESC
+"""
+
 class RedditDataExtractor:
     def __init__(self, db_config: Dict):
         """Initialize with database configuration."""
@@ -18,7 +84,7 @@ class RedditDataExtractor:
     def connect(self):
         """Establish database connection."""
         try:
-            self.connection = mysql.connector.connect(**self.db_config)
+            self.connection = get_pool(self.db_config).get_connection()
             logger.info("Database connection established")
         except Exception as e:
             logger.error(f"Database connection failed: {e}")
@@ -27,106 +93,42 @@ class RedditDataExtractor:
     def disconnect(self):
         """Close database connection."""
         if self.connection:
+            # Pooled connection: close() hands it back to the pool
             self.connection.close()
+            self.connection = None
             logger.info("Database connection closed")
     
     def analyze_corpus(self) -> Dict:
-        """Analyze the corpus to understand data distribution."""
+        """
+        Analyze the corpus to understand data distribution.
+        
+        Reads the materialized statistics kept by the schema.sql triggers
+        (see corpus_stats.py) instead of scanning posts and comments; they
+        are built once here if still empty.
+        """
         if not self.connection:
             self.connect()
             
-        cursor = self.connection.cursor()
+        stats = ensure_corpus_stats(self.connection)
+        posts, comments = stats['posts'], stats['comments']
         
         analysis = {}
         
         # Basic statistics
-        cursor.execute("SELECT COUNT(*) FROM posts")
-        analysis['total_posts'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM comments")
-        analysis['total_comments'] = cursor.fetchone()[0]
+        analysis['total_posts'] = posts['row_count']
+        analysis['total_comments'] = comments['row_count']
         
         # Content length analysis
-        cursor.execute("""
-            SELECT 
-                AVG(CHAR_LENGTH(COALESCE(title, '') + COALESCE(selftext, ''))) as avg_post_length,
-                MAX(CHAR_LENGTH(COALESCE(title, '') + COALESCE(selftext, ''))) as max_post_length,
-                MIN(CHAR_LENGTH(COALESCE(title, '') + COALESCE(selftext, ''))) as min_post_length
-            FROM posts 
-            WHERE title IS NOT NULL
-        """)
-        post_stats = cursor.fetchone()
-        analysis['post_length'] = {
-            'avg': post_stats[0],
-            'max': post_stats[1], 
-            'min': post_stats[2]
-        }
-        
-        cursor.execute("""
-            SELECT 
-                AVG(CHAR_LENGTH(body)) as avg_comment_length,
-                MAX(CHAR_LENGTH(body)) as max_comment_length,
-                MIN(CHAR_LENGTH(body)) as min_comment_length
-            FROM comments 
-            WHERE body IS NOT NULL AND body != '[deleted]' AND body != '[removed]'
-        """)
-        comment_stats = cursor.fetchone()
-        analysis['comment_length'] = {
-            'avg': comment_stats[0],
-            'max': comment_stats[1],
-            'min': comment_stats[2]
-        }
+        analysis['post_length'] = posts['length']
+        analysis['comment_length'] = comments['length']
         
         # Comments per post distribution
-        cursor.execute("""
-            SELECT 
-                p.id,
-                p.num_comments as reported_comments,
-                COUNT(c.id) as actual_comments
-            FROM posts p
-            LEFT JOIN comments c ON p.id = c.post_id
-            GROUP BY p.id
-            ORDER BY actual_comments DESC
-            LIMIT 10
-        """)
-        top_commented_posts = cursor.fetchall()
-        analysis['top_commented_posts'] = top_commented_posts
+        analysis['top_commented_posts'] = get_top_commented_posts(self.connection, limit=10)
         
         # Score distribution
-        cursor.execute("""
-            SELECT 
-                AVG(score) as avg_score,
-                MAX(score) as max_score,
-                MIN(score) as min_score,
-                STDDEV(score) as std_score
-            FROM posts
-        """)
-        post_score_stats = cursor.fetchone()
-        analysis['post_scores'] = {
-            'avg': post_score_stats[0],
-            'max': post_score_stats[1],
-            'min': post_score_stats[2],
-            'std': post_score_stats[3]
-        }
+        analysis['post_scores'] = posts['score']
+        analysis['comment_scores'] = comments['score']
         
-        cursor.execute("""
-            SELECT 
-                AVG(score) as avg_score,
-                MAX(score) as max_score,
-                MIN(score) as min_score,
-                STDDEV(score) as std_score
-            FROM comments
-            WHERE body IS NOT NULL AND body != '[deleted]' AND body != '[removed]'
-        """)
-        comment_score_stats = cursor.fetchone()
-        analysis['comment_scores'] = {
-            'avg': comment_score_stats[0],
-            'max': comment_score_stats[1],
-            'min': comment_score_stats[2],
-            'std': comment_score_stats[3]
-        }
-        
-        cursor.close()
         return analysis
     
     def extract_posts_with_comments(self, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
@@ -157,27 +159,161 @@ class RedditDataExtractor:
         
         logger.info(f"Extracted {len(posts)} posts")
         
-        # Get comments for each post
-        for i, post in enumerate(posts):
-            if i % 50 == 0:  # Progress indicator
-                logger.info(f"Processing post {i+1}/{len(posts)}")
-                
-            cursor.execute("""
+        # Get comments for all posts in a few IN (...) queries instead of one query per post
+        comments_by_post = self.fetch_comments_for_posts(cursor, [post['id'] for post in posts])
+        for post in posts:
+            post['comments'] = comments_by_post.get(post['id'], [])
+        
+        cursor.close()
+        return posts
+    
+    def extract_posts_after(self, after: Optional[Tuple] = None, limit: int = 100) -> List[Dict]:
+        """
+        Extract the next page of posts, with comments, in (created_utc, id) order.
+        
+        Keyset pagination: each page seeks past the last key of the previous one
+        on idx_posts_created_id, so a page costs the same at any depth, and score
+        changes during a run cannot shift rows between pages.
+        
+        Args:
+            after: (created_utc, id) of the last post already processed, or None to start
+            limit: Maximum number of posts in the page
+        
+        Returns:
+            Posts with a 'comments' list each; empty when the corpus is exhausted
+        """
+        if not self.connection:
+            self.connect()
+            
+        cursor = self.connection.cursor(dictionary=True)
+        
+        query = """
+            SELECT 
+                id, title, author, selftext, url, score, 
+                upvote_ratio, num_comments, created_utc, permalink
+            FROM posts 
+            WHERE title IS NOT NULL
+        """
+        params = []
+        if after is not None:
+            query += " AND (created_utc, id) > (%s, %s)"
+            params.extend(after)
+        query += " ORDER BY created_utc, id LIMIT %s"
+        params.append(limit)
+        
+        cursor.execute(query, tuple(params))
+        posts = cursor.fetchall()
+        
+        comments_by_post = self.fetch_comments_for_posts(cursor, [post['id'] for post in posts])
+        for post in posts:
+            post['comments'] = comments_by_post.get(post['id'], [])
+        
+        cursor.close()
+        return posts
+    
+    def fetch_comments_for_posts(self, cursor, post_ids: List[str], ids_per_query: int = 1000) -> Dict[str, List[Dict]]:
+        """
+        Fetch the comments of many posts and group them by post id.
+        
+        Args:
+            cursor: Dictionary cursor to run the queries on
+            post_ids: Posts to fetch comments for
+            ids_per_query: Post ids per IN (...) list, keeping statements a sane size
+        
+        Returns:
+            Comments per post id, each list ordered by score DESC, created_utc ASC
+        """
+        comments_by_post = {post_id: [] for post_id in post_ids}
+        
+        for start in range(0, len(post_ids), ids_per_query):
+            id_batch = post_ids[start:start + ids_per_query]
+            placeholders = ', '.join(['%s'] * len(id_batch))
+            
+            # Matches idx_comments_post_score, so MySQL reads each post's comments in order without a filesort
+            cursor.execute(f"""
                 SELECT 
-                    id, author, body, score, created_utc, 
+                    post_id, id, author, body, score, created_utc, 
                     parent_type, parent_id, permalink
                 FROM comments 
-                WHERE post_id = %s 
-                AND body IS NOT NULL 
-                AND body NOT IN ('[deleted]', '[removed]')
-                ORDER BY score DESC, created_utc ASC
-            """, (post['id'],))
+                WHERE post_id IN ({placeholders})
+                AND is_deleted = 0
+                ORDER BY post_id, score DESC, created_utc ASC
+            """, tuple(id_batch))
             
-            post['comments'] = cursor.fetchall()
+            for comment in cursor.fetchall():
+                comments_by_post[comment.pop('post_id')].append(comment)
+            
+            logger.info(f"Fetched comments for {min(start + ids_per_query, len(post_ids))}/{len(post_ids)} posts")
+        
+        return comments_by_post
+    
+    def fetch_post_watermarks(self) -> Dict[str, Tuple[str, int]]:
+        """
+        Return cheap change markers for every post.
+        
+        Reads only ids and timestamps (idx_comments_post_scraped covers the
+        comment side), never bodies, so it stays fast on a large corpus.
+        
+        Returns:
+            post id -> (newest scraped_at of the post and its comments as ISO text, comment count)
+        """
+        if not self.connection:
+            self.connect()
+        
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            SELECT
+                p.id, GREATEST(p.scraped_at, COALESCE(MAX(c.scraped_at), p.scraped_at)), COUNT(c.id)
+            FROM posts p
+            LEFT JOIN comments c ON c.post_id = p.id
+            WHERE p.title IS NOT NULL
+            GROUP BY p.id, p.scraped_at
+        """)
+        
+        watermarks = {}
+        for post_id, scraped_at, comment_count in cursor:
+            watermarks[post_id] = (scraped_at.isoformat() if scraped_at else None, comment_count)
+        
+        cursor.close()
+        return watermarks
+    
+    def extract_posts_by_ids(self, post_ids: List[str]) -> List[Dict]:
+        """Extract the given posts with their comments, in the same shape as extract_posts_after."""
+        if not self.connection:
+            self.connect()
+        
+        cursor = self.connection.cursor(dictionary=True)
+        
+        posts = []
+        for start in range(0, len(post_ids), 1000):
+            id_batch = post_ids[start:start + 1000]
+            placeholders = ', '.join(['%s'] * len(id_batch))
+            cursor.execute(f"""
+                SELECT
+                    id, title, author, selftext, url, score,
+                    upvote_ratio, num_comments, created_utc, permalink
+                FROM posts
+                WHERE id IN ({placeholders})
+                AND title IS NOT NULL
+            """, tuple(id_batch))
+            posts.extend(cursor.fetchall())
+        
+        comments_by_post = self.fetch_comments_for_posts(cursor, [post['id'] for post in posts])
+        for post in posts:
+            post['comments'] = comments_by_post.get(post['id'], [])
         
         cursor.close()
         return posts
     
+    @staticmethod
+    def high_value_comments_for_post(post: Dict, min_score: int = 5) -> List[Dict]:
+        """The rows get_high_value_comments would return for one post, built from its fetched comments."""
+        return [
+            dict(comment, post_id=post['id'], post_title=post.get('title'), post_author=post.get('author'))
+            for comment in post.get('comments', [])
+            if comment.get('score', 0) >= min_score
+        ]
+    
     def get_high_value_comments(self, min_score: int = 5, limit: Optional[int] = None) -> List[Dict]:
         """Extract high-value standalone comments."""
         if not self.connection:
@@ -185,18 +321,7 @@ class RedditDataExtractor:
             
         cursor = self.connection.cursor(dictionary=True)
         
-        query = """
-            SELECT 
-                c.id, c.author, c.body, c.score, c.created_utc, 
-                c.parent_type, c.parent_id, c.permalink, c.post_id,
-                p.title as post_title, p.author as post_author
-            FROM comments c
-            JOIN posts p ON c.post_id = p.id
-            WHERE c.body IS NOT NULL 
-            AND c.body NOT IN ('[deleted]', '[removed]')
-            AND c.score >= %s
-            ORDER BY c.score DESC, c.created_utc DESC
-        """
+        query = HIGH_VALUE_COMMENTS_QUERY
         
         params = [min_score]
         if limit:
@@ -208,31 +333,341 @@ class RedditDataExtractor:
         
         cursor.close()
         return comments
+    
+    def iter_high_value_comments(self, min_score: int = 5, batch_size: int = 1000) -> Iterator[List[Dict]]:
+        """
+        Stream high-value standalone comments in batches.
+        
+        Same rows and order as get_high_value_comments, but read through an
+        unbuffered cursor: the server streams the result and only one batch is
+        held in memory at a time. An unbuffered result ties up its connection
+        until fully read, so the stream runs on its own pooled connection and
+        self.connection stays free for other queries.
+        
+        Args:
+            min_score: Minimum comment score
+            batch_size: Rows per fetchmany call and per yielded list
+        
+        Yields:
+            Lists of up to batch_size comment dicts
+        """
+        connection = get_pool(self.db_config).get_connection()
+        cursor = connection.cursor(dictionary=True, buffered=False)
+        try:
+            cursor.execute(HIGH_VALUE_COMMENTS_QUERY, (min_score,))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            # Abandoned early: drain the stream so the connection goes back to the pool clean
+            if connection.unread_result:
+                connection.consume_results()
+            cursor.close()
+            connection.close()
+
+class ChunkSink:
+    """
+    Append-only NDJSON chunk file with a resume sidecar.
+    
+    Chunks are written one JSON object per line. After each batch, commit()
+    flushes the file and records the byte offset and the caller's position
+    (e.g. the last post key) in <path>.progress.json. On resume, anything
+    written after the last commit is truncated away and the stored position
+    is returned, so a crash loses at most one batch.
+    """
+    
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self.progress_path = f"{path}.progress.json"
+        self.state = {'offset': 0, 'batches': 0, 'position': None, 'counts': {'1': 0, '2': 0, '3': 0}}
+        
+        if resume and os.path.exists(self.progress_path) and os.path.exists(path):
+            with open(self.progress_path, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+            self.file = open(path, 'r+', encoding='utf-8')
+            self.file.truncate(self.state['offset'])
+            self.file.seek(self.state['offset'])
+            logger.info(f"Resuming {path} after batch {self.state['batches']} "
+                        f"({sum(self.state['counts'].values())} chunks kept)")
+        else:
+            self.file = open(path, 'w', encoding='utf-8')
+    
+    @property
+    def position(self):
+        """Caller position stored by the last commit, or None on a fresh file."""
+        return self.state['position']
+    
+    @property
+    def total(self) -> int:
+        return sum(self.state['counts'].values())
+    
+    def count(self, level: int) -> int:
+        return self.state['counts'][str(level)]
+    
+    def write(self, chunks: Iterable[Dict]) -> int:
+        """Append chunks to the file. Returns the number written."""
+        written = 0
+        for chunk in chunks:
+            self.file.write(json.dumps(chunk, default=str, ensure_ascii=False) + '\n')
+            self.state['counts'][str(chunk['level'])] += 1
+            written += 1
+        return written
+    
+    def commit(self, position=None):
+        """Make everything written so far durable and record the resume position."""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.state['offset'] = self.file.tell()
+        self.state['batches'] += 1
+        self.state['position'] = position
+        
+        tmp_path = f"{self.progress_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, default=str)
+        os.replace(tmp_path, self.progress_path)
+    
+    def close(self, finished: bool = False):
+        """Close the file; a finished run no longer needs its sidecar."""
+        self.file.close()
+        if finished and os.path.exists(self.progress_path):
+            os.remove(self.progress_path)
+
+class ChunkState:
+    """
+    Per-post watermarks and chunk hashes from the last incremental run.
+    
+    For each post the state keeps the newest scraped_at of the post and its
+    comments, the comment count, a hash of the source rows, and a hash per
+    chunk id generated from it. Comparing against these tells which posts need
+    re-chunking and which chunk ids were added, updated or deleted.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.posts = {}
+        self.settings = None
+        self.updated_at = None
+        
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.posts = state['posts']
+            self.settings = state.get('settings')
+            self.updated_at = state.get('updated_at')
+            logger.info(f"Loaded chunk state for {len(self.posts)} posts from {path} (last run {self.updated_at})")
+    
+    @staticmethod
+    def content_hash(post: Dict) -> str:
+        """Hash of a post and its comments as fetched, independent of chunker settings."""
+        source = json.dumps(post, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def chunk_hash(chunk: Dict) -> str:
+        """Hash of a chunk's content and metadata; any change means downstream must re-embed it."""
+        serialized = json.dumps(chunk, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha1(serialized.encode('utf-8')).hexdigest()
+    
+    def is_stale(self, post_id: str, watermark: Tuple[str, int]) -> bool:
+        """True if the post is new or its rows changed since the last run."""
+        entry = self.posts.get(post_id)
+        return entry is None or (entry['scraped_at'], entry['comment_count']) != tuple(watermark)
+    
+    def save(self):
+        """Write the state atomically."""
+        self.updated_at = datetime.now().isoformat()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'updated_at': self.updated_at, 'settings': self.settings, 'posts': self.posts}, f)
+        os.replace(tmp_path, self.path)
 
 class HierarchicalChunker:
-    def __init__(self, max_tokens_l1: int = 1200, max_tokens_l2: int = 600, max_tokens_l3: int = 400):
-        """Initialize with token limits for each level."""
+    # Bump when the chunk text layout or truncation rules change, so stored chunks are regenerated
+    FORMAT_VERSION = 2
+    
+    def __init__(self, max_tokens_l1: int = 1200, max_tokens_l2: int = 600, max_tokens_l3: int = 400,
+                 context_depth: int = 1, tokenizer_name: Optional[str] = None,
+                 max_model_tokens: Optional[int] = None, token_cache_size: int = 100000,
+                 window_overlap: Optional[int] = None):
+        """
+        Initialize with token limits for each level.
+        
+        Args:
+            context_depth: Number of ancestor comments (parent, grandparent, ...)
+                quoted as context in Level 2 chunks for replies
+            tokenizer_name: Hugging Face tokenizer of the embedding model, e.g.
+                'sentence-transformers/all-MiniLM-L12-v2'. Token counts then come
+                from the real tokenizer and the level budgets are clipped to the
+                model's window, special tokens included. None keeps the
+                4-chars-per-token estimate.
+            max_model_tokens: Model window in tokens. Defaults to the SentenceTransformer
+                max_seq_length when the model has one, else the tokenizer's model_max_length
+            token_cache_size: Token counts remembered per chunker
+            window_overlap: Split over-budget text into overlapping windows sharing
+                this many tokens, emitted as linked sub-chunks. None truncates instead.
+        """
         self.max_tokens_l1 = max_tokens_l1
         self.max_tokens_l2 = max_tokens_l2
         self.max_tokens_l3 = max_tokens_l3
+        self.context_depth = context_depth
+        self.tokenizer_name = tokenizer_name
+        self.token_cache_size = token_cache_size
+        self.window_overlap = window_overlap
+        self._token_cache = {}
+        
+        if tokenizer_name:
+            window = max_model_tokens or load_max_seq_length(tokenizer_name) or self.tokenizer.model_max_length
+            # [CLS] and [SEP] are added at encode time and count against every budget
+            special_tokens = self.tokenizer.num_special_tokens_to_add()
+            self.max_tokens_l1 = min(self.max_tokens_l1, window) - special_tokens
+            self.max_tokens_l2 = min(self.max_tokens_l2, window) - special_tokens
+            self.max_tokens_l3 = min(self.max_tokens_l3, window) - special_tokens
+            logger.info(f"Token budgets from {tokenizer_name} (window {window}): L1={self.max_tokens_l1}, "
+                        f"L2={self.max_tokens_l2}, L3={self.max_tokens_l3}")
+    
+    def settings(self) -> Dict:
+        """Everything that shapes chunk content, with the budgets as effectively applied."""
+        return {
+            'format_version': self.FORMAT_VERSION,
+            'tokenizer_name': self.tokenizer_name,
+            'max_tokens_l1': self.max_tokens_l1,
+            'max_tokens_l2': self.max_tokens_l2,
+            'max_tokens_l3': self.max_tokens_l3,
+            'context_depth': self.context_depth,
+            'window_overlap': self.window_overlap
+        }
+    
+    def __getstate__(self):
+        # Pool workers load the tokenizer themselves (once per process) instead of unpickling it per task
+        state = self.__dict__.copy()
+        state['_token_cache'] = {}
+        return state
+    
+    @property
+    def tokenizer(self):
+        return load_tokenizer(self.tokenizer_name) if self.tokenizer_name else None
         
     def estimate_tokens(self, text: str) -> int:
-        """Rough token estimation (4 chars per token average)."""
-        return len(text) // 4
+        """Token count of text: exact with a tokenizer, else a rough 4 chars per token."""
+        if not self.tokenizer_name:
+            return len(text) // 4
+        return self.count_tokens_batch([text])[0]
     
-    def clean_text(self, text: str) -> str:
-        """Clean and normalize text content."""
-        if not text:
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Token counts for many texts, tokenizing the uncached ones in one call."""
+        if not self.tokenizer_name:
+            return [len(text) // 4 for text in texts]
+        
+        missing = [text for text in set(texts) if text not in self._token_cache]
+        if missing:
+            if len(self._token_cache) + len(missing) > self.token_cache_size:
+                self._token_cache.clear()
+            encoded = self.tokenizer(missing, add_special_tokens=False)['input_ids']
+            for text, ids in zip(missing, encoded):
+                self._token_cache[text] = len(ids)
+        return [self._token_cache[text] for text in texts]
+    
+    def truncate_to_tokens(self, text: str, max_tokens: int) -> str:
+        """Cut text to at most max_tokens tokens (or max_tokens * 4 chars without a tokenizer)."""
+        max_tokens = max(max_tokens, 0)
+        if not self.tokenizer_name:
+            return text[:max_tokens * 4]
+        
+        encoded = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+        offsets = encoded['offset_mapping']
+        if len(offsets) <= max_tokens:
+            return text
+        if max_tokens == 0:
             return ""
+        return text[:offsets[max_tokens - 1][1]]
+    
+    def truncate_between(self, prefix: str, text: str, suffix: str, max_tokens: int, marker: str = "...") -> str:
+        """
+        Cut text so that prefix + text + marker + suffix fits in max_tokens; returns text + marker.
         
-        # Remove markdown formatting
-        text = text.replace('**', '').replace('*', '')
-        text = text.replace('\n\n', '\n').replace('\r', '')
+        Counts of the parts don't add up exactly to the count of the joined
+        content, so the joined content is measured and the cut tightened until it fits.
+        """
+        available = max_tokens - self.estimate_tokens(prefix) - self.estimate_tokens(suffix) - self.estimate_tokens(marker)
+        while True:
+            truncated = self.truncate_to_tokens(text, available) + marker
+            overflow = self.estimate_tokens(prefix + truncated + suffix) - max_tokens
+            if overflow <= 0 or available <= 0:
+                return truncated
+            available -= overflow
+    
+    def split_windows(self, text: str, max_tokens: int, overlap: int) -> List[str]:
+        """Split text into windows of at most max_tokens tokens, consecutive windows sharing overlap tokens."""
+        max_tokens = max(max_tokens, 1)
+        overlap = min(overlap, max_tokens // 2)
+        step = max_tokens - overlap
+        windows = []
         
-        # Remove excessive whitespace
-        text = ' '.join(text.split())
+        if self.tokenizer_name:
+            offsets = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)['offset_mapping']
+            if len(offsets) <= max_tokens:
+                return [text]
+            for start in range(0, len(offsets), step):
+                end = min(start + max_tokens, len(offsets))
+                windows.append(text[offsets[start][0]:offsets[end - 1][1]])
+                if end == len(offsets):
+                    break
+            return windows
         
-        return text.strip()
+        # 4 chars per token; cut on spaces where possible so words stay whole
+        max_chars, overlap_chars = max_tokens * 4, overlap * 4
+        if len(text) <= max_chars:
+            return [text]
+        start = 0
+        while start < len(text):
+            end = min(start + max_chars, len(text))
+            if end < len(text):
+                cut = text.rfind(' ', start, end)
+                if cut > start + max_chars // 2:
+                    end = cut
+            windows.append(text[start:end].strip())
+            if end == len(text):
+                break
+            next_start = max(end - overlap_chars, start + 1)
+            space = text.find(' ', next_start, end)
+            start = space + 1 if space != -1 else next_start
+        return windows
+    
+    def build_windowed_chunks(self, chunk: Dict, prefix: str, text: str, suffix: str, max_tokens: int) -> List[Dict]:
+        """
+        Turn an over-budget chunk into overlapping sub-chunks of its main text.
+        
+        Every window repeats prefix and suffix (context, author, score). Windows
+        get ids <id>_w<n> and metadata parent_id / window_index / window_count,
+        so retrieval can reach the whole text and regroup the pieces.
+        """
+        available = max_tokens - self.estimate_tokens(prefix) - self.estimate_tokens(suffix)
+        windows = self.split_windows(text, available, self.window_overlap)
+        if len(windows) == 1:
+            return [dict(chunk, content=prefix + text + suffix)]
+        
+        return [
+            dict(
+                chunk,
+                id=f"{chunk['id']}_w{i}",
+                content=prefix + window + suffix,
+                metadata=dict(chunk['metadata'], parent_id=chunk['id'], window_index=i, window_count=len(windows),
+                              text_hash=self.text_hash(window))
+            )
+            for i, window in enumerate(windows)
+        ]
+    
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """Hash of text ignoring case, punctuation and whitespace, for exact-duplicate detection."""
+        normalized = ' '.join(WORD_PATTERN.findall(text.lower()))
+        return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+    
+    def clean_text(self, text: str) -> str:
+        """Clean and normalize text content."""
+        return normalize(text, 'chunk')
     
     def create_level1_chunks(self, posts_data: List[Dict]) -> List[Dict]:
         """Create Level 1 chunks: Post + top comments."""
@@ -258,15 +693,32 @@ class HierarchicalChunker:
             content += "Top Community Responses:\n"
             current_tokens = self.estimate_tokens(content)
             
-            for i, comment in enumerate(comments[:10]):  # Max 10 top comments
-                comment_text = self.clean_text(comment.get('body', ''))
-                comment_addition = f"\n[Comment {i+1}] {comment.get('author', 'Unknown')} (Score: {comment.get('score', 0)}): {comment_text}\n"
-                
-                if current_tokens + self.estimate_tokens(comment_addition) > self.max_tokens_l1:
+            # Count all candidate comments in one tokenizer call
+            comment_additions = [
+                f"\n[Comment {i+1}] {comment.get('author', 'Unknown')} (Score: {comment.get('score', 0)}): {self.clean_text(comment.get('body', ''))}\n"
+                for i, comment in enumerate(comments[:10])  # Max 10 top comments
+            ]
+            
+            addition_counts = self.count_tokens_batch(comment_additions)
+            
+            # With windowing, keep every top comment and split the whole post instead of dropping comments
+            windowed = self.window_overlap is not None and current_tokens + sum(addition_counts) > self.max_tokens_l1
+            if windowed:
+                header = f"Title: {title}\n\n"
+                body = content[len(header):] + ''.join(comment_additions)
+            elif selftext and current_tokens > self.max_tokens_l1:
+                # The post alone is over budget; cut its text so the chunk fits the model window
+                post_prefix = f"Title: {title}\n\nPost: "
+                post_suffix = content[len(post_prefix) + len(selftext):]
+                content = post_prefix + self.truncate_between(post_prefix, selftext, post_suffix, self.max_tokens_l1) + post_suffix
+                current_tokens = self.estimate_tokens(content)
+            
+            for comment_addition, addition_tokens in zip(comment_additions, addition_counts):
+                if current_tokens + addition_tokens > self.max_tokens_l1:
                     break
                     
                 content += comment_addition
-                current_tokens += self.estimate_tokens(comment_addition)
+                current_tokens += addition_tokens
             
             chunk = {
                 'id': f"l1_{post['id']}",
@@ -280,10 +732,14 @@ class HierarchicalChunker:
                     'score': post.get('score', 0),
                     'created_utc': post.get('created_utc'),
                     'num_comments': len(comments),
-                    'permalink': post.get('permalink')
+                    'permalink': post.get('permalink'),
+                    'text_hash': self.text_hash(content)
                 }
             }
-            chunks.append(chunk)
+            if windowed:
+                chunks.extend(self.build_windowed_chunks(chunk, header, body, "", self.max_tokens_l1))
+            else:
+                chunks.append(chunk)
             
         return chunks
     
@@ -293,38 +749,44 @@ class HierarchicalChunker:
         
         for post in posts_data:
             post_title = self.clean_text(post.get('title', ''))
+            comments = post.get('comments', [])
+            
+            # One pass per post: id -> comment for parent lookups, cleaned context text on demand
+            comments_by_id = {c['id']: c for c in comments}
+            context_texts = {}
             
-            for comment in post.get('comments', []):
+            for comment in comments:
                 comment_text = self.clean_text(comment.get('body', ''))
                 
                 if not comment_text or len(comment_text) < 20:  # Skip very short comments
                     continue
+                text_hash = self.text_hash(comment_text)  # Of the full text, before any truncation
                 
                 # Build context
                 content = f"Post Context: {post_title}\n\n"
                 
-                # Add parent comment if it's a reply
-                if comment.get('parent_type') == 'comment':
-                    # Find parent comment
-                    parent_comment = next(
-                        (c for c in post.get('comments', []) if c['id'] == comment.get('parent_id')), 
-                        None
-                    )
-                    if parent_comment:
-                        parent_text = self.clean_text(parent_comment.get('body', ''))[:200]  # Truncate if long
-                        content += f"Replying to: {parent_text}\n\n"
+                # Add parent comment (and further ancestors) if it's a reply
+                ancestors = self.find_ancestors(comment, comments_by_id)
+                for depth, ancestor in enumerate(reversed(ancestors)):
+                    ancestor_id = ancestor['id']
+                    if ancestor_id not in context_texts:
+                        context_texts[ancestor_id] = self.clean_text(ancestor.get('body', ''))[:200]  # Truncate if long
+                    label = "Replying to" if depth == len(ancestors) - 1 else "Earlier in thread"
+                    content += f"{label}: {context_texts[ancestor_id]}\n\n"
                 
-                content += f"Comment: {comment_text}\n\n"
-                content += f"Author: {comment.get('author', 'Unknown')}\n"
-                content += f"Score: {comment.get('score', 0)}"
+                content += "Comment: "
+                prefix = content
+                suffix = f"\n\nAuthor: {comment.get('author', 'Unknown')}\nScore: {comment.get('score', 0)}"
+                content = prefix + comment_text + suffix
+                windowed = False
                 
                 # Check token limit
-                if self.estimate_tokens(content) > self.max_tokens_l2:
+                if self.estimate_tokens(content) > self.max_tokens_l2 and self.window_overlap is not None:
+                    windowed = True
+                elif self.estimate_tokens(content) > self.max_tokens_l2:
                     # Truncate comment if too long
-                    available_tokens = self.max_tokens_l2 - self.estimate_tokens(content.replace(comment_text, ''))
-                    max_comment_chars = available_tokens * 4
-                    comment_text = comment_text[:max_comment_chars] + "..."
-                    content = content.replace(comment.get('body', ''), comment_text)
+                    comment_text = self.truncate_between(prefix, comment_text, suffix, self.max_tokens_l2)
+                    content = prefix + comment_text + suffix
                 
                 chunk = {
                     'id': f"l2_{comment['id']}",
@@ -338,13 +800,55 @@ class HierarchicalChunker:
                         'score': comment.get('score', 0),
                         'created_utc': comment.get('created_utc'),
                         'parent_type': comment.get('parent_type'),
-                        'permalink': comment.get('permalink')
+                        'permalink': comment.get('permalink'),
+                        'text_hash': text_hash
                     }
                 }
-                chunks.append(chunk)
+                if windowed:
+                    chunks.extend(self.build_windowed_chunks(chunk, prefix, comment_text, suffix, self.max_tokens_l2))
+                else:
+                    chunks.append(chunk)
         
         return chunks
     
+    def iter_batch_chunks(self, posts_data: List[Dict], executor: Optional[ProcessPoolExecutor] = None,
+                          shard_size: int = 25) -> Iterator[Dict]:
+        """
+        Yield the L1 and L2 chunks of a batch of posts.
+        
+        Args:
+            posts_data: Posts with their comments
+            executor: Optional process pool; posts are split into shards chunked in
+                parallel. Output order is the same as without an executor.
+            shard_size: Posts per task sent to the pool
+        """
+        if executor is None:
+            yield from self.create_level1_chunks(posts_data)
+            yield from self.create_level2_chunks(posts_data)
+            return
+        
+        shards = [posts_data[i:i + shard_size] for i in range(0, len(posts_data), shard_size)]
+        results = list(executor.map(_chunk_shard, repeat(self), shards))
+        for l1_chunks, _ in results:
+            yield from l1_chunks
+        for _, l2_chunks in results:
+            yield from l2_chunks
+    
+    def find_ancestors(self, comment: Dict, comments_by_id: Dict[str, Dict]) -> List[Dict]:
+        """Return up to context_depth ancestors of a comment, nearest first."""
+        ancestors = []
+        seen = {comment['id']}
+        current = comment
+        while len(ancestors) < self.context_depth and current.get('parent_type') == 'comment':
+            parent = comments_by_id.get(current.get('parent_id'))
+            # Parents can be missing (deleted, or not stored); stop at the first gap
+            if parent is None or parent['id'] in seen:
+                break
+            ancestors.append(parent)
+            seen.add(parent['id'])
+            current = parent
+        return ancestors
+    
     def create_level3_chunks(self, high_value_comments: List[Dict]) -> List[Dict]:
         """Create Level 3 chunks: High-value standalone comments."""
         chunks = []
@@ -352,18 +856,19 @@ class HierarchicalChunker:
         for comment in high_value_comments:
             comment_text = self.clean_text(comment.get('body', ''))
             post_title = self.clean_text(comment.get('post_title', ''))
+            text_hash = self.text_hash(comment_text)
             
-            content = f"Context: {post_title}\n\n"
-            content += f"High-Value Response: {comment_text}\n\n"
-            content += f"Author: {comment.get('author', 'Unknown')}\n"
-            content += f"Community Score: {comment.get('score', 0)}"
+            prefix = f"Context: {post_title}\n\nHigh-Value Response: "
+            suffix = f"\n\nAuthor: {comment.get('author', 'Unknown')}\nCommunity Score: {comment.get('score', 0)}"
+            content = prefix + comment_text + suffix
+            windowed = False
             
             # Ensure within token limit
-            if self.estimate_tokens(content) > self.max_tokens_l3:
-                available_tokens = self.max_tokens_l3 - self.estimate_tokens(content.replace(comment_text, ''))
-                max_comment_chars = available_tokens * 4
-                comment_text = comment_text[:max_comment_chars] + "..."
-                content = content.replace(comment.get('body', ''), comment_text)
+            if self.estimate_tokens(content) > self.max_tokens_l3 and self.window_overlap is not None:
+                windowed = True
+            elif self.estimate_tokens(content) > self.max_tokens_l3:
+                comment_text = self.truncate_between(prefix, comment_text, suffix, self.max_tokens_l3)
+                content = prefix + comment_text + suffix
             
             chunk = {
                 'id': f"l3_{comment['id']}",
@@ -377,32 +882,178 @@ class HierarchicalChunker:
                     'score': comment.get('score', 0),
                     'created_utc': comment.get('created_utc'),
                     'post_title': post_title,
-                    'permalink': comment.get('permalink')
+                    'permalink': comment.get('permalink'),
+                    'text_hash': text_hash
                 }
             }
-            chunks.append(chunk)
+            if windowed:
+                chunks.extend(self.build_windowed_chunks(chunk, prefix, comment_text, suffix, self.max_tokens_l3))
+            else:
+                chunks.append(chunk)
         
         return chunks
 
-def main_batch_processing():
-    """Alternative main function for batch processing large datasets."""
-    
-    db_config = {
-        'host': 'localhost',
-        'port': 3306,
-        'database': 'reddit_mindfulness',
-        'user': 'root',
-        'password': 'admin123',
-        'charset': 'utf8mb4',
-        'use_unicode': True
-    }
+class ChunkDeduplicator:
+    """
+    Find chunks whose text was already seen, so each unique text is embedded once.
+    
+    Exact duplicates are matched on metadata['text_hash'] (normalized text).
+    With near_duplicates=True, MinHash signatures over word shingles with LSH
+    banding also catch lightly edited copies. In 'link' mode duplicates are
+    kept with metadata['duplicate_of'] set to the first chunk with that text,
+    and the embedding pipeline reuses that chunk's vector. In 'drop' mode
+    duplicates within the same level are removed; cross-level copies (an L3
+    chunk of a comment that also has an L2 chunk) are always linked, so every
+    level stays complete.
+    """
+    
+    def __init__(self, mode: str = 'link', near_duplicates: bool = False, num_perm: int = 64,
+                 bands: int = 16, shingle_size: int = 5, min_words: int = 20):
+        """
+        Args:
+            mode: 'link' or 'drop'
+            near_duplicates: Also match near-duplicates with MinHash
+            num_perm: MinHash permutations; must be divisible by bands
+            bands: LSH bands; more bands catch lower similarities
+            shingle_size: Words per shingle
+            min_words: Texts shorter than this are only matched exactly
+        """
+        if mode not in ('link', 'drop'):
+            raise ValueError(f"mode must be 'link' or 'drop', got {mode!r}")
+        self.mode = mode
+        self.near_duplicates = near_duplicates
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+        
+        # Fixed seed so signatures are comparable across runs and processes
+        rng = random.Random(1234)
+        self.prime = (1 << 61) - 1
+        self.permutations = [(rng.randrange(1, self.prime), rng.randrange(0, self.prime)) for _ in range(num_perm)]
+        
+        self.seen_hashes = {}  # text_hash -> (chunk id, level)
+        self.lsh_buckets = {}  # (band, band signature) -> (chunk id, level)
+        self.stats = {'unique': 0, 'exact': 0, 'near': 0, 'dropped': 0}
+    
+    def minhash(self, text: str) -> Optional[List[int]]:
+        """MinHash signature of the text's word shingles, or None for short texts."""
+        words = WORD_PATTERN.findall(text.lower())
+        if len(words) < self.min_words:
+            return None
+        shingles = {
+            int.from_bytes(hashlib.blake2b(' '.join(words[i:i + self.shingle_size]).encode('utf-8'),
+                                           digest_size=8).digest(), 'big')
+            for i in range(len(words) - self.shingle_size + 1)
+        }
+        prime = self.prime
+        return [min((a * shingle + b) % prime for shingle in shingles) for a, b in self.permutations]
+    
+    def band_keys(self, signature: List[int]) -> List[tuple]:
+        return [(band, tuple(signature[band * self.rows:(band + 1) * self.rows])) for band in range(self.bands)]
+    
+    def find_duplicate(self, chunk: Dict) -> Optional[Tuple[str, int]]:
+        """Return (id, level) of an earlier chunk with the same text, registering this one if new."""
+        text_hash = chunk['metadata'].get('text_hash') or HierarchicalChunker.text_hash(chunk['content'])
+        entry = (chunk['id'], chunk['level'])
+        
+        if text_hash in self.seen_hashes:
+            self.stats['exact'] += 1
+            return self.seen_hashes[text_hash]
+        
+        duplicate = None
+        keys = []
+        if self.near_duplicates:
+            signature = self.minhash(chunk['content'])
+            if signature is not None:
+                keys = self.band_keys(signature)
+                duplicate = next((self.lsh_buckets[key] for key in keys if key in self.lsh_buckets), None)
+        
+        if duplicate is not None:
+            # Later exact copies of this text point straight at the original
+            self.seen_hashes[text_hash] = duplicate
+            self.stats['near'] += 1
+            return duplicate
+        
+        self.seen_hashes[text_hash] = entry
+        for key in keys:
+            self.lsh_buckets[key] = entry
+        self.stats['unique'] += 1
+        return None
+    
+    def process(self, chunks: Iterable[Dict]) -> Iterator[Dict]:
+        """Yield chunks with duplicates linked or dropped."""
+        for chunk in chunks:
+            duplicate = self.find_duplicate(chunk)
+            if duplicate is None:
+                yield chunk
+                continue
+            
+            duplicate_id, duplicate_level = duplicate
+            if self.mode == 'drop' and duplicate_level == chunk['level']:
+                self.stats['dropped'] += 1
+                continue
+            chunk['metadata']['duplicate_of'] = duplicate_id
+            yield chunk
+    
+    def load_existing(self, path: str):
+        """Register the chunks of an existing NDJSON file, e.g. when resuming."""
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    self.find_duplicate(json.loads(line))
+
+def _chunk_shard(chunker: HierarchicalChunker, posts_data: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """Process pool task: L1 and L2 chunks for one shard of posts."""
+    return chunker.create_level1_chunks(posts_data), chunker.create_level2_chunks(posts_data)
+
+def main_batch_processing(resume: bool = False, num_workers: int = 1, tokenizer_name: Optional[str] = None,
+                          window_overlap: Optional[int] = None, dedup_mode: Optional[str] = 'link',
+                          near_duplicates: bool = False, max_model_tokens: Optional[int] = None):
+    """
+    Alternative main function for batch processing large datasets.
+    
+    Args:
+        resume: Continue from the progress sidecar of an interrupted run
+        num_workers: Processes for chunking; 1 chunks in this process
+        tokenizer_name: Budget chunks with this Hugging Face tokenizer instead of estimates
+        window_overlap: Split long text into overlapping sub-chunks instead of truncating
+        dedup_mode: 'link' or 'drop' duplicate chunks (see ChunkDeduplicator), None to keep all
+        near_duplicates: Also detect near-duplicates with MinHash
+        max_model_tokens: Embedding model window, if the tokenizer's config does not give it
+    """
+    
+    db_config = get_db_config()
+    output_file = 'hierarchical_chunks_full.ndjson'  # One chunk per line, written as batches complete
     
     extractor = RedditDataExtractor(db_config)
-    chunker = HierarchicalChunker()
+    chunker = HierarchicalChunker(tokenizer_name=tokenizer_name, window_overlap=window_overlap,
+                                  max_model_tokens=max_model_tokens)
+    sink = ChunkSink(output_file, resume=resume)
+    
+    deduplicator = None
+    if dedup_mode:
+        deduplicator = ChunkDeduplicator(mode=dedup_mode, near_duplicates=near_duplicates)
+        if resume:
+            deduplicator.load_existing(output_file)
     
-    all_chunks = []
     batch_size = 100  # Process 100 posts at a time
-    offset = 0
+    shard_size = 25  # Posts per process pool task
+    finished = False
+    
+    executor = None
+    if num_workers > 1:
+        executor = ProcessPoolExecutor(max_workers=num_workers)
+        # Give every worker a few shards per batch
+        batch_size = max(batch_size, num_workers * shard_size * 2)
+        logger.info(f"Chunking with {num_workers} worker processes, {batch_size} posts per batch")
+    
+    # Position is the (created_utc, id) of the last post written, 'level3' once L1/L2
+    # are done, or 'done' once L3 is written too
+    position = sink.position
+    after = None
+    if position not in (None, 'level3', 'done'):
+        after = (datetime.fromisoformat(position[0]), position[1])
     
     try:
         # Get total post count first
@@ -414,50 +1065,174 @@ def main_batch_processing():
         
         logger.info(f"Total posts to process: {total_posts}")
         
-        # Process in batches
-        while offset < total_posts:
-            logger.info(f"Processing batch: {offset}-{offset+batch_size}")
+        # Process in batches, seeking past the last key instead of using OFFSET
+        while position not in ('level3', 'done'):
+            logger.info(f"Processing batch {sink.state['batches'] + 1} of about {total_posts // batch_size + 1}")
             
             # Extract batch
-            posts_data = extractor.extract_posts_with_comments(limit=batch_size, offset=offset)
+            posts_data = extractor.extract_posts_after(after, limit=batch_size)
             
             if not posts_data:
+                position = 'level3'
+                sink.commit(position=position)
                 break
-                
-            # Create chunks for this batch
-            l1_chunks = chunker.create_level1_chunks(posts_data)
-            l2_chunks = chunker.create_level2_chunks(posts_data)
             
-            all_chunks.extend(l1_chunks)
-            all_chunks.extend(l2_chunks)
-            
-            logger.info(f"Batch {offset//batch_size + 1}: +{len(l1_chunks)} L1 chunks, +{len(l2_chunks)} L2 chunks")
+            after = (posts_data[-1]['created_utc'], posts_data[-1]['id'])
+                
+            # Stream this batch's chunks to disk; nothing is kept across batches
+            batch_chunks = chunker.iter_batch_chunks(posts_data, executor, shard_size)
+            if deduplicator is not None:
+                batch_chunks = deduplicator.process(batch_chunks)
+            written = sink.write(batch_chunks)
+            sink.commit(position=(after[0].isoformat(), after[1]))
             
-            offset += batch_size
+            logger.info(f"Batch {sink.state['batches']}: +{written} L1/L2 chunks")
         
         # Process high-value comments once
-        logger.info("Processing high-value comments...")
-        high_value_comments = extractor.get_high_value_comments(min_score=3)
-        l3_chunks = chunker.create_level3_chunks(high_value_comments)
-        all_chunks.extend(l3_chunks)
+        if position != 'done':
+            logger.info("Processing high-value comments...")
+            # Streamed in batches; committed once at the end, so a crash redoes Level 3 from the start
+            for high_value_comments in extractor.iter_high_value_comments(min_score=3):
+                l3_chunks = chunker.create_level3_chunks(high_value_comments)
+                if deduplicator is not None:
+                    l3_chunks = deduplicator.process(l3_chunks)
+                sink.write(l3_chunks)
+                logger.info(f"Level 3: {sink.count(3)} chunks written")
+            sink.commit(position='done')
+        finished = True
         
         # Final summary
-        l1_count = len([c for c in all_chunks if c['level'] == 1])
-        l2_count = len([c for c in all_chunks if c['level'] == 2])
-        l3_count = len([c for c in all_chunks if c['level'] == 3])
-        
         print(f"\n=== Final Chunking Results ===")
-        print(f"Level 1 chunks (Post + Comments): {l1_count}")
-        print(f"Level 2 chunks (Individual Comments): {l2_count}")
-        print(f"Level 3 chunks (High-Value Comments): {l3_count}")
-        print(f"Total chunks: {len(all_chunks)}")
+        print(f"Level 1 chunks (Post + Comments): {sink.count(1)}")
+        print(f"Level 2 chunks (Individual Comments): {sink.count(2)}")
+        print(f"Level 3 chunks (High-Value Comments): {sink.count(3)}")
+        print(f"Total chunks: {sink.total}")
+        if deduplicator is not None:
+            print(f"Deduplication ({dedup_mode}): {deduplicator.stats}")
         
-        # Save chunks
-        with open('hierarchical_chunks_full.json', 'w', encoding='utf-8') as f:
-            json.dump(all_chunks, f, indent=2, default=str, ensure_ascii=False)
+        logger.info(f"All chunks saved to {output_file}")
         
-        logger.info("All chunks saved to hierarchical_chunks_full.json")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        sink.close(finished=finished)
+        extractor.disconnect()
+
+def main_incremental(tokenizer_name: Optional[str] = None, window_overlap: Optional[int] = None,
+                     min_score: int = 3, max_model_tokens: Optional[int] = None) -> Dict[str, List[str]]:
+    """
+    Regenerate chunks only for posts whose source rows changed since the last run.
+    
+    Post watermarks (newest scraped_at, comment count) are compared with
+    hierarchical_chunks_state.json; changed posts are re-fetched, and skipped
+    if their content hash is unchanged. New and changed chunks go to a delta
+    NDJSON file, and a changeset JSON lists the added, updated and deleted
+    chunk ids for the embedding stage. The state is saved only after both are
+    written, so an interrupted run is simply repeated. Without a state file
+    every chunk is reported as added.
+    
+    Chunks are not deduplicated here, since a duplicate_of link could point at
+    a chunk deleted by the same run.
+    
+    Args:
+        tokenizer_name: Budget chunks with this Hugging Face tokenizer instead of estimates
+        window_overlap: Split long text into overlapping sub-chunks instead of truncating
+        min_score: Minimum score of Level 3 comments, as in main_batch_processing
+        max_model_tokens: Embedding model window, as in main_batch_processing
+    
+    Returns:
+        The changeset: chunk ids per 'added', 'updated' and 'deleted'
+    """
+    
+    db_config = get_db_config()
+    state_file = 'hierarchical_chunks_state.json'
+    run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+    delta_file = f'hierarchical_chunks_delta_{run_id}.ndjson'
+    changeset_file = f'hierarchical_chunks_changeset_{run_id}.json'
+    
+    extractor = RedditDataExtractor(db_config)
+    chunker = HierarchicalChunker(tokenizer_name=tokenizer_name, window_overlap=window_overlap,
+                                  max_model_tokens=max_model_tokens)
+    state = ChunkState(state_file)
+    changes = {'added': [], 'updated': [], 'deleted': []}
+    batch_size = 100  # Posts fetched per query round
+    
+    # Other chunker settings change every chunk: re-chunk everything, still diffing by chunk id
+    settings = dict(chunker.settings(), min_score=min_score)
+    settings_changed = state.settings is not None and state.settings != settings
+    if settings_changed:
+        logger.info(f"Chunker settings changed from {state.settings} to {settings}; re-chunking all posts")
+    
+    try:
+        watermarks = extractor.fetch_post_watermarks()
+        stale_ids = [post_id for post_id, watermark in watermarks.items()
+                     if settings_changed or state.is_stale(post_id, watermark)]
+        removed_ids = [post_id for post_id in state.posts if post_id not in watermarks]
+        logger.info(f"{len(stale_ids)} of {len(watermarks)} posts new or changed, {len(removed_ids)} removed")
         
+        for post_id in removed_ids:
+            changes['deleted'].extend(state.posts.pop(post_id)['chunks'])
+        
+        regenerated = 0
+        with open(delta_file, 'w', encoding='utf-8') as f:
+            for start in range(0, len(stale_ids), batch_size):
+                posts_data = extractor.extract_posts_by_ids(stale_ids[start:start + batch_size])
+                
+                for post in posts_data:
+                    entry = state.posts.get(post['id'])
+                    scraped_at, comment_count = watermarks[post['id']]
+                    content_hash = ChunkState.content_hash(post)
+                    
+                    # Touched but not changed, e.g. re-scraped with the same counters
+                    if entry is not None and entry['content_hash'] == content_hash and not settings_changed:
+                        entry['scraped_at'], entry['comment_count'] = scraped_at, comment_count
+                        continue
+                    
+                    chunks = (chunker.create_level1_chunks([post])
+                              + chunker.create_level2_chunks([post])
+                              + chunker.create_level3_chunks(extractor.high_value_comments_for_post(post, min_score)))
+                    
+                    old_hashes = entry['chunks'] if entry is not None else {}
+                    new_hashes = {}
+                    for chunk in chunks:
+                        chunk_hash = ChunkState.chunk_hash(chunk)
+                        new_hashes[chunk['id']] = chunk_hash
+                        if old_hashes.get(chunk['id']) == chunk_hash:
+                            continue
+                        changes['updated' if chunk['id'] in old_hashes else 'added'].append(chunk['id'])
+                        f.write(json.dumps(chunk, default=str, ensure_ascii=False) + '\n')
+                    changes['deleted'].extend(chunk_id for chunk_id in old_hashes if chunk_id not in new_hashes)
+                    
+                    state.posts[post['id']] = {
+                        'scraped_at': scraped_at,
+                        'comment_count': comment_count,
+                        'content_hash': content_hash,
+                        'chunks': new_hashes
+                    }
+                    regenerated += 1
+                
+                logger.info(f"Checked {min(start + batch_size, len(stale_ids))}/{len(stale_ids)} changed posts, "
+                            f"{regenerated} re-chunked")
+        
+        changeset = {
+            'run_id': run_id,
+            'previous_run': state.updated_at,
+            'chunks_file': delta_file,
+            **changes
+        }
+        with open(changeset_file, 'w', encoding='utf-8') as f:
+            json.dump(changeset, f, indent=2)
+        
+        state.settings = settings
+        state.save()
+        
+        print(f"\n=== Incremental Chunking Results ===")
+        print(f"Posts re-chunked: {regenerated} of {len(watermarks)}")
+        print(f"Chunks added: {len(changes['added'])}, updated: {len(changes['updated'])}, "
+              f"deleted: {len(changes['deleted'])}")
+        logger.info(f"Changed chunks saved to {delta_file}, changeset to {changeset_file}")
+        return changes
+    
     finally:
         extractor.disconnect()
 
@@ -465,15 +1240,7 @@ def main():
     """Main function to demonstrate the data extraction and chunking."""
     
     # Database configuration
-    db_config = {
-        'host': 'localhost',
-        'port': 3306,
-        'database': 'reddit_mindfulness',
-        'user': 'root',
-        'password': 'admin123',
-        'charset': 'utf8mb4',
-        'use_unicode': True
-    }
+    db_config = get_db_config()
     
     # Initialize extractor
     extractor = RedditDataExtractor(db_config)
@@ -543,9 +1310,21 @@ def main():
 
 if __name__ == "__main__":
     # Choose processing method
-    import sys
-    
     if len(sys.argv) > 1 and sys.argv[1] == "--batch":
-        main_batch_processing()
+        workers = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else 1
+        # e.g. --tokenizer sentence-transformers/all-MiniLM-L12-v2
+        tokenizer = sys.argv[sys.argv.index("--tokenizer") + 1] if "--tokenizer" in sys.argv else None
+        # Only needed when the model has no sentence_bert_config.json giving max_seq_length
+        max_model_tokens = int(sys.argv[sys.argv.index("--max-model-tokens") + 1]) if "--max-model-tokens" in sys.argv else None
+        overlap = int(sys.argv[sys.argv.index("--window-overlap") + 1]) if "--window-overlap" in sys.argv else None
+        dedup = sys.argv[sys.argv.index("--dedup") + 1] if "--dedup" in sys.argv else 'link'
+        main_batch_processing(resume="--resume" in sys.argv, num_workers=workers, tokenizer_name=tokenizer,
+                              window_overlap=overlap, dedup_mode=None if dedup == 'none' else dedup,
+                              near_duplicates="--near-duplicates" in sys.argv, max_model_tokens=max_model_tokens)
+    elif len(sys.argv) > 1 and sys.argv[1] == "--incremental":
+        tokenizer = sys.argv[sys.argv.index("--tokenizer") + 1] if "--tokenizer" in sys.argv else None
+        max_model_tokens = int(sys.argv[sys.argv.index("--max-model-tokens") + 1]) if "--max-model-tokens" in sys.argv else None
+        overlap = int(sys.argv[sys.argv.index("--window-overlap") + 1]) if "--window-overlap" in sys.argv else None
+        main_incremental(tokenizer_name=tokenizer, window_overlap=overlap, max_model_tokens=max_model_tokens)
     else:
         main()
\ No newline at end of file
@@ -0,0 +1,185 @@
+"""
+Shared MySQL access for the scraper, extractor and topic scripts.
+
+Connections come from one pool per configuration, so worker threads can
+borrow and return them without reconnecting. Settings are read from the
+environment (or .env), falling back to the local development database:
+
+    MYSQL_HOST, MYSQL_PORT, MYSQL_DATABASE, MYSQL_USER, MYSQL_PASSWORD, MYSQL_POOL_SIZE
+"""
+
+import os
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Optional, Dict, Any
+
+from mysql.connector import pooling, Error
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:  # .env support is optional outside the scraper
+    pass
+
+logger = logging.getLogger(__name__)
+
+# mysql-connector refuses pools larger than this
+MAX_POOL_SIZE = 32
+
+
+def get_db_config(overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Return connection settings from the environment, with optional overrides."""
+    config = {
+        'host': os.getenv('MYSQL_HOST', 'localhost'),
+        'port': int(os.getenv('MYSQL_PORT', '3306')),
+        'database': os.getenv('MYSQL_DATABASE', 'reddit_mindfulness'),
+        'user': os.getenv('MYSQL_USER', 'root'),
+        'password': os.getenv('MYSQL_PASSWORD', 'admin123'),
+        'charset': 'utf8mb4',
+        'use_unicode': True
+    }
+    if overrides:
+        config.update(overrides)
+    return config
+
+
+class DatabasePool:
+    """
+    A MySQL connection pool that health-checks connections on checkout.
+
+    Borrowed connections go back to the pool on close(). When every
+    connection is in use, get_connection() waits for one instead of failing.
+    """
+
+    def __init__(self, config: Dict[str, Any], pool_size: int = 8, pool_name: str = 'reddit_mindfulness'):
+        self.config = config
+        self.pool_size = min(pool_size, MAX_POOL_SIZE)
+        self.pool = pooling.MySQLConnectionPool(pool_name=pool_name, pool_size=self.pool_size, **config)
+        logger.info(f"Created MySQL pool '{pool_name}' with {self.pool_size} connections "
+                    f"to {config['host']}:{config['port']}/{config['database']}")
+
+    def get_connection(self, timeout: float = 30.0):
+        """
+        Borrow a live connection from the pool.
+
+        Args:
+            timeout: Seconds to wait for a free connection
+
+        Returns:
+            A pooled connection; close() returns it to the pool
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                connection = self.pool.get_connection()
+                break
+            except pooling.PoolError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.05)
+
+        # Idle connections can be dropped by the server (wait_timeout); reconnect transparently
+        try:
+            connection.ping(reconnect=True, attempts=3, delay=1)
+        except Error:
+            connection.close()
+            raise
+        return connection
+
+    @contextmanager
+    def connection(self, timeout: float = 30.0):
+        """Borrow a connection for the duration of a with block."""
+        connection = self.get_connection(timeout)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @contextmanager
+    def cursor(self, dictionary: bool = False, prepared: bool = False, commit: bool = False):
+        """
+        Borrow a connection and cursor for the duration of a with block.
+
+        Args:
+            dictionary: Return rows as dicts
+            prepared: Use a server-side prepared statement cursor; repeated
+                execute() calls with the same query skip re-parsing
+            commit: Commit when the block exits cleanly, roll back otherwise
+        """
+        with self.connection() as connection:
+            cursor = connection.cursor(dictionary=dictionary, prepared=prepared)
+            try:
+                yield cursor
+                if commit:
+                    connection.commit()
+            except Exception:
+                if commit:
+                    connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+
+_pools: Dict[tuple, DatabasePool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(config: Optional[Dict[str, Any]] = None, pool_size: Optional[int] = None) -> DatabasePool:
+    """
+    Return the process-wide pool for a configuration, creating it on first use.
+
+    Args:
+        config: Connection settings; defaults to get_db_config()
+        pool_size: Connections in a newly created pool; defaults to MYSQL_POOL_SIZE or 8
+    """
+    config = config or get_db_config()
+    key = tuple(sorted((name, str(value)) for name, value in config.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            size = pool_size or int(os.getenv('MYSQL_POOL_SIZE', '8'))
+            pool = DatabasePool(config, pool_size=size, pool_name=f"reddit_mindfulness_{len(_pools)}")
+            _pools[key] = pool
+        return pool
+
+
+def get_connection(config: Optional[Dict[str, Any]] = None, timeout: float = 30.0):
+    """Borrow a health-checked connection from the shared pool."""
+    return get_pool(config).get_connection(timeout)
+
+
+class PreparedCursors:
+    """
+    Prepared-statement cursors kept open on one connection, one per query.
+
+    For single-row statements run many times (per-post lookups, for example),
+    the server parses the query once and later calls only send parameters.
+    Batched inserts should keep using executemany on a plain cursor, which
+    mysql-connector rewrites into multi-row INSERTs.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursors = {}
+
+    def execute(self, query: str, params: tuple = ()):
+        """Execute query with positional (%s) params and return its cursor."""
+        cursor = self._cursors.get(query)
+        if cursor is None:
+            cursor = self.connection.cursor(prepared=True)
+            self._cursors[query] = cursor
+        cursor.execute(query, params)
+        return cursor
+
+    def fetchall(self, query: str, params: tuple = ()) -> list:
+        return self.execute(query, params).fetchall()
+
+    def close(self):
+        for cursor in self._cursors.values():
+            try:
+                cursor.close()
+            except Error:
+                pass
+        self._cursors.clear()
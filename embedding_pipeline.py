@@ -67,6 +67,13 @@ class EmbeddingGenerator:
         logger.info(f"Completed generating embeddings for query texts")
         return np.vstack(all_embeddings)
 
+def load_chunks(path: str) -> List[Dict[str, Any]]:
+    """Load chunks from a JSON array file or an NDJSON file written by ChunkSink."""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.ndjson'):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
 def test_weaviate_connection(host="localhost", port=6060):
     """Simple function to test Weaviate v4 connection."""
     print(f"Testing Weaviate v4 connection to {host}:{port}")
@@ -111,7 +118,7 @@ def main():
     """Main function to run the embedding pipeline."""
     
     # Configuration
-    CHUNKS_FILE = "hierarchical_chunks.json"  # or "hierarchical_chunks_full.json"
+    CHUNKS_FILE = "hierarchical_chunks.json"  # or "hierarchical_chunks_full.ndjson"
     WEAVIATE_HOST = "localhost"
     WEAVIATE_PORT = 6060
     EMBEDDING_MODEL = "all-MiniLM-L12-v2"
@@ -131,8 +138,7 @@ def main():
     
     # Load chunks
     logger.info(f"Loading chunks from {CHUNKS_FILE}")
-    with open(CHUNKS_FILE, 'r', encoding='utf-8') as f:
-        chunks = json.load(f)
+    chunks = load_chunks(CHUNKS_FILE)
     logger.info(f"Loaded {len(chunks)} chunks")
     
     # Initialize embedding generator
@@ -231,6 +237,16 @@ def main():
                     data_type=wvc.DataType.TEXT,
                     description="Reddit permalink"
                 ),
+                wvc.Property(
+                    name="parent_chunk_id",
+                    data_type=wvc.DataType.TEXT,
+                    description="Chunk this window was split from (windowed chunks only)"
+                ),
+                wvc.Property(
+                    name="window_index",
+                    data_type=wvc.DataType.INT,
+                    description="Position of this window within its parent chunk"
+                ),
                 wvc.Property(
                     name="embedding_model",
                     data_type=wvc.DataType.TEXT,
@@ -245,12 +261,22 @@ def main():
         )
         logger.info(f"Collection created successfully")
         
-        # Extract texts for embedding
-        texts = [chunk['content'] for chunk in chunks]
+        # Chunks linked to an earlier copy (metadata duplicate_of) reuse its vector instead of being embedded
+        chunk_ids = {chunk['id'] for chunk in chunks}
+        to_embed = [
+            chunk for chunk in chunks
+            if chunk.get('metadata', {}).get('duplicate_of') not in chunk_ids
+        ]
+        texts = [chunk['content'] for chunk in to_embed]
         
         # Generate embeddings
-        logger.info("Generating embeddings...")
-        embeddings = embedding_generator.generate_embeddings(texts)
+        logger.info(f"Generating embeddings for {len(texts)} unique chunks "
+                    f"({len(chunks) - len(texts)} duplicates reuse a vector)...")
+        vectors = dict(zip((chunk['id'] for chunk in to_embed), embedding_generator.generate_embeddings(texts)))
+        embeddings = [
+            vectors.get(chunk.get('metadata', {}).get('duplicate_of')) if chunk['id'] not in vectors else vectors[chunk['id']]
+            for chunk in chunks
+        ]
         
         # Prepare data objects
         logger.info("Preparing data objects...")
@@ -269,6 +295,8 @@ def main():
                 "title": chunk.get('metadata', {}).get('title', ''),
                 "num_comments": chunk.get('metadata', {}).get('num_comments', 0),
                 "permalink": chunk.get('metadata', {}).get('permalink', ''),
+                "parent_chunk_id": chunk.get('metadata', {}).get('parent_id', ''),
+                "window_index": chunk.get('metadata', {}).get('window_index', 0),
                 "embedding_model": EMBEDDING_MODEL,
                 "processed_at": datetime.now()
             }
@@ -0,0 +1,42 @@
+-- Optional: partition comments by created_utc, one partition per year
+-- Run after 001. Rebuilds comments; run with the scraper stopped.
+--
+-- MySQL restrictions on partitioned tables shape this migration:
+--   * No foreign keys: comments.post_id -> posts.id is dropped, and with it
+--     ON DELETE CASCADE. Delete a post's comments explicitly, then run
+--     `python corpus_stats.py --rebuild`.
+--   * Every unique key must include the partitioning column: the primary key
+--     becomes (id, created_utc). INSERT IGNORE still skips re-scraped comments,
+--     since a comment's created_utc never changes.
+--   * TIMESTAMP columns partition on UNIX_TIMESTAMP(), and created_utc must be NOT NULL.
+--
+-- Queries filtering on created_utc read only the matching partitions; the
+-- others use each partition's copy of the indexes from 001.
+--
+-- Add next year's partition before it starts:
+--   ALTER TABLE comments REORGANIZE PARTITION p_future INTO (
+--       PARTITION p2027 VALUES LESS THAN (UNIX_TIMESTAMP('2028-01-01 00:00:00')),
+--       PARTITION p_future VALUES LESS THAN MAXVALUE);
+
+USE reddit_mindfulness;
+
+-- The constraint name is generated; look it up with:
+--   SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+--   WHERE CONSTRAINT_SCHEMA = 'reddit_mindfulness' AND TABLE_NAME = 'comments';
+ALTER TABLE comments DROP FOREIGN KEY comments_ibfk_1;
+
+ALTER TABLE comments
+    MODIFY created_utc TIMESTAMP NOT NULL,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, created_utc)
+PARTITION BY RANGE (UNIX_TIMESTAMP(created_utc)) (
+    PARTITION p_before_2020 VALUES LESS THAN (UNIX_TIMESTAMP('2020-01-01 00:00:00')),
+    PARTITION p2020 VALUES LESS THAN (UNIX_TIMESTAMP('2021-01-01 00:00:00')),
+    PARTITION p2021 VALUES LESS THAN (UNIX_TIMESTAMP('2022-01-01 00:00:00')),
+    PARTITION p2022 VALUES LESS THAN (UNIX_TIMESTAMP('2023-01-01 00:00:00')),
+    PARTITION p2023 VALUES LESS THAN (UNIX_TIMESTAMP('2024-01-01 00:00:00')),
+    PARTITION p2024 VALUES LESS THAN (UNIX_TIMESTAMP('2025-01-01 00:00:00')),
+    PARTITION p2025 VALUES LESS THAN (UNIX_TIMESTAMP('2026-01-01 00:00:00')),
+    PARTITION p2026 VALUES LESS THAN (UNIX_TIMESTAMP('2027-01-01 00:00:00')),
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
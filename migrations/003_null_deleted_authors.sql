@@ -0,0 +1,9 @@
+-- Store deleted authors as NULL in rows loaded by pushshift_loader.py before it did so
+-- The live scraper has always stored NULL; archives use the literal '[deleted]', which
+-- then topped author_activity and the top-author lists.
+
+USE reddit_mindfulness;
+
+UPDATE posts SET author = NULL WHERE author = '[deleted]';
+UPDATE comments SET author = NULL WHERE author = '[deleted]';
+DELETE FROM author_activity WHERE author = '[deleted]';
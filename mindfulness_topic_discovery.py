@@ -1,4 +1,3 @@
-import mysql.connector
 import pandas as pd
 import numpy as np
 from bertopic import BERTopic
@@ -6,7 +5,6 @@ from sentence_transformers import SentenceTransformer
 from sklearn.feature_extraction.text import CountVectorizer
 from umap import UMAP
 from hdbscan import HDBSCAN
-import re
 import logging
 from typing import List, Dict, Tuple
 import json
@@ -14,6 +12,8 @@ import pickle
 from datetime import datetime
 import matplotlib.pyplot as plt
 import seaborn as sns
+from db import get_db_config, get_pool
+from text_normalizer import normalize, normalize_batch
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -34,7 +34,7 @@ class MindfulnessTopicDiscovery:
     def connect_to_database(self):
         """Connect to MySQL database."""
         try:
-            self.connection = mysql.connector.connect(**self.db_config)
+            self.connection = get_pool(self.db_config).get_connection()
             logger.info("Successfully connected to database")
             return True
         except Exception as e:
@@ -46,6 +46,7 @@ class MindfulnessTopicDiscovery:
         if self.connection and self.connection.is_connected():
             self.connection.close()
             logger.info("Database connection closed")
+        self.connection = None
     
     def extract_all_content(self, min_word_count: int = 5) -> List[Dict]:
         """Extract all posts and comments from database with metadata."""
@@ -77,9 +78,8 @@ class MindfulnessTopicDiscovery:
                 p.title as post_title, 'comment' as content_type
             FROM comments c
             JOIN posts p ON c.post_id = p.id
-            WHERE c.body IS NOT NULL 
-            AND c.body NOT IN ('[deleted]', '[removed]')
-            AND CHAR_LENGTH(TRIM(c.body)) > 0
+            WHERE c.is_deleted = 0
+            AND c.body_length > 0
         """
         cursor.execute(comments_query)
         comments = cursor.fetchall()
@@ -134,26 +134,7 @@ class MindfulnessTopicDiscovery:
     
     def clean_text(self, text: str) -> str:
         """Clean and preprocess text for topic modeling."""
-        if not text:
-            return ""
-        
-        # Remove URLs
-        text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
-        
-        # Remove Reddit-specific formatting
-        text = re.sub(r'/u/\w+', '', text)  # Remove username mentions
-        text = re.sub(r'/r/\w+', '', text)  # Remove subreddit mentions
-        text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)  # Remove bold formatting
-        text = re.sub(r'\*([^*]+)\*', r'\1', text)  # Remove italic formatting
-        
-        # Remove excessive whitespace and newlines
-        text = re.sub(r'\n+', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Basic cleaning
-        text = text.strip()
-        
-        return text
+        return normalize(text, 'topic')
     
     def prepare_documents(self, content_data: List[Dict]) -> Tuple[List[str], List[Dict]]:
         """Prepare documents for topic modeling."""
@@ -162,9 +143,8 @@ class MindfulnessTopicDiscovery:
         documents = []
         metadata = []
         
-        for item in content_data:
-            cleaned_text = self.clean_text(item['text'])
-            
+        cleaned_texts = normalize_batch((item['text'] for item in content_data), 'topic')
+        for item, cleaned_text in zip(content_data, cleaned_texts):
             if cleaned_text and len(cleaned_text.split()) >= 5:  # Double-check word count
                 documents.append(cleaned_text)
                 metadata.append(item)
@@ -367,15 +347,7 @@ def main():
     """Main function to run topic discovery."""
     
     # Database configuration
-    db_config = {
-        'host': 'localhost',
-        'port': 3306,
-        'database': 'reddit_mindfulness',
-        'user': 'root',
-        'password': 'admin123',
-        'charset': 'utf8mb4',
-        'use_unicode': True
-    }
+    db_config = get_db_config()
     
     # Initialize topic discovery
     topic_discovery = MindfulnessTopicDiscovery(db_config)
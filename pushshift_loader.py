@@ -0,0 +1,345 @@
+from mysql.connector import Error
+import datetime
+import gzip
+import io
+import json
+import os
+import re
+import tempfile
+import time
+import logging
+from typing import Optional, Dict, Any, List, Iterator
+from db import get_db_config, get_pool
+
+try:
+    import zstandard
+except ImportError:  # Only needed for .zst archives
+    zstandard = None
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('pushshift_loader.log'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+POST_COLUMNS = ('id', 'title', 'author', 'content', 'url', 'score', 'upvote_ratio', 'num_comments',
+                'created_utc', 'subreddit', 'is_self', 'selftext', 'permalink')
+
+COMMENT_COLUMNS = ('id', 'post_id', 'author', 'body', 'score', 'created_utc',
+                   'parent_type', 'parent_id', 'permalink')
+
+# Archived rows never overwrite what the live scraper stored; its counters are newer
+POST_INSERT_QUERY = f"""
+    INSERT IGNORE INTO posts ({', '.join(POST_COLUMNS)})
+    VALUES ({', '.join(['%s'] * len(POST_COLUMNS))})
+"""
+
+COMMENT_INSERT_QUERY = f"""
+    INSERT IGNORE INTO comments ({', '.join(COMMENT_COLUMNS)})
+    VALUES ({', '.join(['%s'] * len(COMMENT_COLUMNS))})
+"""
+
+# Pushshift dumps are compressed with a long window; the default reader limit rejects them
+ZSTD_MAX_WINDOW_SIZE = 2 ** 31
+
+
+def open_archive(path: str) -> io.TextIOBase:
+    """Open a .zst, .gz or plain NDJSON archive as a text stream."""
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError("zstandard is required for .zst archives: pip install zstandard")
+        raw = open(path, 'rb')
+        reader = zstandard.ZstdDecompressor(max_window_size=ZSTD_MAX_WINDOW_SIZE).stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8', errors='replace')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+
+class PushshiftLoader:
+    """
+    Bulk-load Pushshift-style submission and comment archives into MySQL.
+
+    Archives are streamed line by line and written in fixed-size batches, so
+    memory use does not depend on archive size. Load submissions before
+    comments: comments whose post is missing are dropped by the foreign key.
+    """
+
+    def __init__(self, subreddits: Optional[List[str]] = None, batch_size: int = 5000,
+                 use_load_data: bool = False):
+        """
+        Args:
+            subreddits: Subreddit names to keep (case-insensitive); None keeps everything
+            batch_size: Rows per executemany call or LOAD DATA file
+            use_load_data: Load batches through LOAD DATA LOCAL INFILE instead of
+                batched INSERTs. Needs local_infile enabled on the server.
+        """
+        self.subreddits = {name.lower() for name in subreddits} if subreddits else None
+        # Cheap test on the raw line before parsing; most lines of a full dump are other subreddits
+        self.subreddit_pattern = re.compile(
+            r'"subreddit"\s*:\s*"(?:' + '|'.join(re.escape(name) for name in sorted(self.subreddits)) + r')"',
+            re.IGNORECASE
+        ) if self.subreddits else None
+        self.batch_size = batch_size
+        self.use_load_data = use_load_data
+        self.db_connection = None
+        self.stats = {'lines': 0, 'kept': 0, 'written': 0, 'failed': 0, 'malformed': 0}
+
+    def setup_database_connection(self) -> bool:
+        """Set up MySQL database connection."""
+        try:
+            config = get_db_config({'allow_local_infile': True}) if self.use_load_data else None
+            self.db_connection = get_pool(config).get_connection()
+            logger.info("Database connection established successfully")
+            return True
+        except Error as e:
+            logger.error(f"Failed to connect to database: {e}")
+            return False
+
+    def close_connections(self):
+        """Close database connection."""
+        if self.db_connection and self.db_connection.is_connected():
+            self.db_connection.close()
+            logger.info("Database connection closed")
+        self.db_connection = None
+
+    def iter_records(self, path: str) -> Iterator[Dict[str, Any]]:
+        """Yield the JSON objects of an archive that belong to the selected subreddits."""
+        with open_archive(path) as f:
+            for line in f:
+                self.stats['lines'] += 1
+                if self.subreddit_pattern is not None and not self.subreddit_pattern.search(line):
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    self.stats['malformed'] += 1
+                    continue
+
+                subreddit = str(record.get('subreddit') or '').lower()
+                if self.subreddits is not None and subreddit not in self.subreddits:
+                    continue
+                self.stats['kept'] += 1
+                yield record
+
+    @staticmethod
+    def strip_prefix(fullname: Optional[str]) -> Optional[str]:
+        """Turn 't3_abc' into 'abc'."""
+        if fullname and len(fullname) > 3 and fullname[2] == '_':
+            return fullname[3:]
+        return fullname
+
+    @staticmethod
+    def clean_author(author) -> Optional[str]:
+        """Author name, or None for '[deleted]' as the live scraper stores it."""
+        if not author or author == '[deleted]':
+            return None
+        return str(author)
+
+    @staticmethod
+    def convert_utc_timestamp(value) -> Optional[datetime.datetime]:
+        """Convert an archive timestamp (int, float or numeric string) to datetime."""
+        try:
+            return datetime.datetime.fromtimestamp(int(float(value)))
+        except (TypeError, ValueError):
+            return None
+
+    def build_post_row(self, record: Dict[str, Any]) -> Optional[tuple]:
+        """Map a submission record onto POST_COLUMNS."""
+        post_id = record.get('id')
+        created_utc = self.convert_utc_timestamp(record.get('created_utc'))
+        if not post_id or created_utc is None:
+            return None
+
+        title = record.get('title') or ''
+        selftext = record.get('selftext')
+        return (
+            post_id,
+            title[:1000],
+            self.clean_author(record.get('author')),
+            selftext,
+            record.get('url'),
+            record.get('score') or 0,
+            record.get('upvote_ratio'),
+            record.get('num_comments') or 0,
+            created_utc,
+            record.get('subreddit'),
+            bool(record.get('is_self', False)),
+            selftext,
+            record.get('permalink')
+        )
+
+    def build_comment_row(self, record: Dict[str, Any]) -> Optional[tuple]:
+        """Map a comment record onto COMMENT_COLUMNS, or None for deleted/removed comments."""
+        body = record.get('body')
+        if body is None or body in ['[deleted]', '[removed]']:
+            return None
+
+        comment_id = record.get('id')
+        post_id = self.strip_prefix(record.get('link_id'))
+        created_utc = self.convert_utc_timestamp(record.get('created_utc'))
+        if not comment_id or not post_id or created_utc is None:
+            return None
+
+        parent_fullname = str(record.get('parent_id') or '')
+        if parent_fullname.startswith('t1_'):
+            parent_type = 'comment'
+            parent_id = parent_fullname[3:]
+        else:
+            parent_type = 'post'
+            parent_id = post_id
+
+        # Older dumps have no permalink; rebuild the canonical one
+        permalink = record.get('permalink') or f"/r/{record.get('subreddit')}/comments/{post_id}/_/{comment_id}/"
+        return (
+            comment_id,
+            post_id,
+            self.clean_author(record.get('author')),
+            body,
+            record.get('score') or 0,
+            created_utc,
+            parent_type,
+            parent_id,
+            permalink
+        )
+
+    @staticmethod
+    def tsv_field(value) -> str:
+        """Encode one value for LOAD DATA with the default escaping rules."""
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            return '1' if value else '0'
+        if isinstance(value, datetime.datetime):
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        text = str(value)
+        return (text.replace('\\', '\\\\').replace('\t', '\\t')
+                .replace('\n', '\\n').replace('\r', '\\r').replace('\0', '\\0'))
+
+    def write_batch(self, table: str, columns: tuple, insert_query: str, rows: List[tuple]) -> int:
+        """Write one batch of rows and commit. Returns the number of rows sent, 0 if the batch failed."""
+        if not rows:
+            return 0
+
+        cursor = self.db_connection.cursor()
+        try:
+            if self.use_load_data:
+                with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.tsv', delete=False) as f:
+                    for row in rows:
+                        f.write('\t'.join(self.tsv_field(value) for value in row) + '\n')
+                    tsv_path = f.name
+                try:
+                    cursor.execute(
+                        f"LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE {table} "
+                        f"CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+                        f"({', '.join(columns)})",
+                        (tsv_path,)
+                    )
+                finally:
+                    os.remove(tsv_path)
+            else:
+                cursor.executemany(insert_query, rows)
+            self.db_connection.commit()
+            self.stats['written'] += len(rows)
+            return len(rows)
+        except Error as e:
+            logger.error(f"Error loading {len(rows)} rows into {table}: {e}")
+            self.db_connection.rollback()
+            self.stats['failed'] += len(rows)
+            return 0
+        finally:
+            cursor.close()
+
+    def load_file(self, path: str, kind: str) -> int:
+        """
+        Stream one archive into the database.
+
+        Args:
+            path: Archive path (.zst, .gz or plain NDJSON)
+            kind: 'submissions' or 'comments'
+
+        Returns:
+            Number of rows sent to MySQL
+        """
+        if kind == 'submissions':
+            table, columns, insert_query, build_row = 'posts', POST_COLUMNS, POST_INSERT_QUERY, self.build_post_row
+        elif kind == 'comments':
+            table, columns, insert_query, build_row = 'comments', COMMENT_COLUMNS, COMMENT_INSERT_QUERY, self.build_comment_row
+        else:
+            raise ValueError(f"kind must be 'submissions' or 'comments', got {kind!r}")
+
+        logger.info(f"Loading {kind} from {path}")
+        start = time.monotonic()
+        written = 0
+        batch = []
+
+        for record in self.iter_records(path):
+            row = build_row(record)
+            if row is None:
+                continue
+            batch.append(row)
+
+            if len(batch) >= self.batch_size:
+                written += self.write_batch(table, columns, insert_query, batch)
+                batch = []
+                logger.info(f"{path}: {written} {kind} written, {self.stats['lines']} lines read")
+
+        written += self.write_batch(table, columns, insert_query, batch)
+
+        elapsed = time.monotonic() - start
+        logger.info(f"Finished {path}: {written} {kind} written in {elapsed:.1f}s "
+                    f"({written / elapsed if elapsed > 0 else 0:.0f} rows/s)")
+        return written
+
+    def run(self, submission_paths: List[str], comment_paths: List[str]) -> Dict[str, int]:
+        """Load all submission archives, then all comment archives."""
+        if not self.setup_database_connection():
+            return self.stats
+
+        try:
+            for path in submission_paths:
+                self.load_file(path, 'submissions')
+            for path in comment_paths:
+                self.load_file(path, 'comments')
+        except KeyboardInterrupt:
+            logger.info("Loading interrupted by user")
+        finally:
+            self.close_connections()
+
+        logger.info(f"Load completed! {self.stats}")
+        if self.stats['failed']:
+            # Inserts are IGNOREd, so re-running the same archives only fills the gaps
+            logger.error(f"{self.stats['failed']} rows failed to load; re-run the same archives to retry them")
+        return self.stats
+
+
+def main():
+    """Bulk-load Pushshift archives for the configured subreddits."""
+    import argparse
+
+    # Configuration
+    SUBREDDITS = ['mindfulness', 'Meditation', 'DecidingToBeBetter', 'GetDisciplined']
+    BATCH_SIZE = 5000  # Rows per executemany call or LOAD DATA file
+
+    parser = argparse.ArgumentParser(description="Load Pushshift NDJSON archives (.zst/.gz) into MySQL")
+    parser.add_argument('--submissions', nargs='*', default=[], metavar='FILE', help='Submission archives')
+    parser.add_argument('--comments', nargs='*', default=[], metavar='FILE', help='Comment archives')
+    parser.add_argument('--subreddit', action='append', help='Subreddit to keep (repeatable); defaults to the configured list')
+    parser.add_argument('--all-subreddits', action='store_true', help='Keep every record, e.g. for per-subreddit dumps')
+    parser.add_argument('--load-data', action='store_true', help='Use LOAD DATA LOCAL INFILE instead of batched INSERTs')
+    args = parser.parse_args()
+
+    subreddits = None if args.all_subreddits else (args.subreddit or SUBREDDITS)
+    loader = PushshiftLoader(subreddits, batch_size=BATCH_SIZE, use_load_data=args.load_data)
+    stats = loader.run(args.submissions, args.comments)
+    if stats['failed']:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,19 @@
 import praw
-import mysql.connector
 from mysql.connector import Error
 import datetime
 import time
 import os
+import queue
+import threading
+import heapq
+import json
+import gzip
+from types import SimpleNamespace
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
+from db import get_connection, get_pool, PreparedCursors
 
 # Load environment variables
 load_dotenv()
@@ -22,39 +29,494 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Existing posts get their live counters refreshed so incremental runs can
+# compare num_comments against what was stored last time
+POST_INSERT_QUERY = """
+    INSERT INTO posts 
+    (id, title, author, content, url, score, upvote_ratio, num_comments, 
+     created_utc, subreddit, is_self, selftext, permalink)
+    VALUES (%(id)s, %(title)s, %(author)s, %(content)s, %(url)s, %(score)s, 
+            %(upvote_ratio)s, %(num_comments)s, %(created_utc)s, %(subreddit)s, 
+            %(is_self)s, %(selftext)s, %(permalink)s)
+    ON DUPLICATE KEY UPDATE
+        score = VALUES(score),
+        upvote_ratio = VALUES(upvote_ratio),
+        num_comments = VALUES(num_comments)
+"""
+
+# Column order of COMMENT_INSERT_QUERY parameters
+COMMENT_COLUMNS = ('id', 'post_id', 'author', 'body', 'score', 'created_utc',
+                   'parent_type', 'parent_id', 'permalink')
+
+COMMENT_INSERT_QUERY = """
+    INSERT IGNORE INTO comments 
+    (id, post_id, author, body, score, created_utc, parent_type, parent_id, permalink)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+SKIPPED_MORE_INSERT_QUERY = """
+    INSERT INTO skipped_more_comments (post_id, parent_id, more_count, depth, children)
+    VALUES (%(post_id)s, %(parent_id)s, %(more_count)s, %(depth)s, %(children)s)
+"""
+
+# ER_LOCK_DEADLOCK, ER_LOCK_WAIT_TIMEOUT: the stats triggers make parallel writers lock
+# shared author_activity rows, so a post transaction can lose a deadlock and be replayed
+RETRYABLE_WRITE_ERRNOS = (1213, 1205)
+
+class ScrapeProgress:
+    """Thread-safe post and comment counters for one subreddit listing."""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.posts_fetched = 0
+        self.posts_written = 0
+        self.comments_written = 0
+        self.started_at = time.time()
+        self.checkpoint: Optional['ScrapeCheckpoint'] = None
+        self._lock = threading.Lock()
+    
+    def record_fetch(self):
+        """Count a post whose comments have been fetched."""
+        with self._lock:
+            self.posts_fetched += 1
+    
+    def record_write(self, post_id: str, comment_count: int):
+        """Count a post and its comments committed to the database."""
+        with self._lock:
+            self.posts_written += 1
+            self.comments_written += comment_count
+        if self.checkpoint is not None:
+            self.checkpoint.complete(post_id)
+    
+    def summary(self) -> Dict[str, Any]:
+        """Return the counters and throughput since the listing started."""
+        with self._lock:
+            elapsed = time.time() - self.started_at
+            return {
+                'name': self.name,
+                'posts_fetched': self.posts_fetched,
+                'posts_written': self.posts_written,
+                'comments_written': self.comments_written,
+                'elapsed_seconds': round(elapsed, 1),
+                'posts_per_minute': round(self.posts_written / elapsed * 60, 2) if elapsed else 0.0,
+                'comments_per_second': round(self.comments_written / elapsed, 2) if elapsed else 0.0
+            }
+
+def raw_thing(obj) -> Dict[str, Any]:
+    """Return the public JSON attributes of a PRAW object, without its comment tree."""
+    data = {}
+    for key, value in vars(obj).items():
+        if key.startswith('_') or key in ('comments', 'replies'):
+            continue
+        if value is None or isinstance(value, (str, int, float, bool, list, dict)):
+            data[key] = value
+        else:
+            # Redditor, Subreddit and similar lazy objects serialize as their name
+            data[key] = str(value)
+    return data
+
+class ScrapeRecorder:
+    """
+    Append raw posts and their comments to a gzip-compressed NDJSON file.
+    
+    Each line is {"post": {...}, "comments": [...]} with the post's and
+    comments' raw API attributes. Comments are stored flat, parents first;
+    ReplaySource rebuilds the reply trees from parent_id.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.posts_recorded = 0
+        self._file = gzip.open(path, 'at', encoding='utf-8')
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def default_path(cls, subreddit_name: str) -> str:
+        return f"scrape_record_{subreddit_name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.ndjson.gz"
+    
+    def record(self, post, raw_comments: List[Dict[str, Any]]):
+        """Write one post and its raw comments."""
+        line = json.dumps({'post': raw_thing(post), 'comments': raw_comments}, default=str, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self.posts_recorded += 1
+    
+    def close(self):
+        with self._lock:
+            self._file.close()
+        logger.info(f"Recorded {self.posts_recorded} posts to {self.path}")
+
+class ReplayForest(list):
+    """Comment forest rebuilt from a recording; already fully expanded."""
+    
+    def replace_more(self, limit=None):
+        return []
+
+class ReplaySource:
+    """
+    Iterate posts recorded by ScrapeRecorder as PRAW-like objects.
+    
+    Posts and comments are SimpleNamespace objects carrying the recorded
+    attributes, with post.comments and comment.replies rebuilt as trees, so
+    they go through build_post_row and flatten_comment_forest unchanged.
+    """
+    
+    def __init__(self, paths: List[str]):
+        self.paths = paths
+    
+    def build_forest(self, raw_comments: List[Dict[str, Any]]) -> ReplayForest:
+        """Rebuild reply trees from flat comments recorded parents first."""
+        forest = ReplayForest()
+        nodes = {}
+        for data in raw_comments:
+            comment = SimpleNamespace(**data)
+            comment.replies = []
+            nodes[comment.id] = comment
+            
+            parent = str(data.get('parent_id') or '')
+            parent_comment = nodes.get(parent[3:]) if parent.startswith('t1_') else None
+            if parent_comment is not None:
+                parent_comment.replies.append(comment)
+            else:
+                forest.append(comment)
+        return forest
+    
+    def __iter__(self):
+        for path in self.paths:
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    post = SimpleNamespace(**record['post'])
+                    post.comments = self.build_forest(record['comments'])
+                    yield post
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket that paces Reddit API calls to just under the live quota.
+    
+    Reddit reports the requests remaining in the current window and when the
+    window resets; PRAW exposes both as reddit.auth.limits. Before each call
+    the refill rate is recomputed as remaining / seconds-until-reset, scaled
+    by safety_factor, so calls speed up when there is headroom and slow down
+    when bursts (such as MoreComments expansion) eat into the quota. Safe to
+    share between threads; threads with their own PRAW instances on the same
+    credentials share one quota, so each instance is registered with watch().
+    """
+    
+    def __init__(self, reddit=None, default_rate: float = 1.0, safety_factor: float = 0.9,
+                 burst: int = 5, min_rate: float = 0.05):
+        """
+        Args:
+            reddit: PRAW instance whose rate-limit headers drive the rate (more can be added with watch())
+            default_rate: Requests per second before any headers have been seen
+            safety_factor: Fraction of the remaining quota to use
+            burst: Bucket capacity, i.e. calls allowed back to back
+            min_rate: Lowest rate, used when the quota is nearly exhausted
+        """
+        self.reddits = [reddit] if reddit is not None else []
+        self.rate = default_rate
+        self.safety_factor = safety_factor
+        self.capacity = burst
+        self.min_rate = min_rate
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.remaining: Optional[float] = None
+        self.reset_in: Optional[float] = None
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.last_wait = 0.0
+        self._lock = threading.Lock()
+    
+    def watch(self, reddit):
+        """Also read the rate-limit headers of another PRAW instance on the same credentials."""
+        with self._lock:
+            self.reddits.append(reddit)
+    
+    def update_from_headers(self):
+        """Recompute the refill rate from the latest rate-limit headers of the watched instances."""
+        remaining = reset_timestamp = None
+        for reddit in self.reddits:
+            limits = getattr(getattr(reddit, 'auth', None), 'limits', None) or {}
+            if limits.get('remaining') is None or limits.get('reset_timestamp') is None:
+                continue
+            # Headers from the newest window win; within it the lowest remaining count is the latest
+            if (reset_timestamp is None or limits['reset_timestamp'] > reset_timestamp + 1.0 or
+                    (abs(limits['reset_timestamp'] - reset_timestamp) <= 1.0 and limits['remaining'] < remaining)):
+                remaining, reset_timestamp = limits['remaining'], limits['reset_timestamp']
+        if remaining is None:
+            return
+        
+        self.remaining = remaining
+        self.reset_in = max(reset_timestamp - time.time(), 1.0)
+        if remaining < 1:
+            # Quota spent: the next token arrives when the window resets
+            self.rate = 1.0 / self.reset_in
+        else:
+            self.rate = max(remaining * self.safety_factor / self.reset_in, self.min_rate)
+    
+    def acquire(self, tokens: int = 1) -> float:
+        """
+        Block until tokens are available and take them.
+        
+        Returns:
+            Seconds spent waiting
+        """
+        with self._lock:
+            self.update_from_headers()
+            
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            
+            # Take the tokens now, going into debt if needed, so concurrent callers queue up fairly
+            self.tokens -= tokens
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            
+            self.acquired += tokens
+            self.total_wait += wait
+            self.last_wait = wait
+        
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Return the current pacing state."""
+        with self._lock:
+            return {
+                'rate_per_second': round(self.rate, 3),
+                'rate_per_minute': round(self.rate * 60, 1),
+                'quota_remaining': self.remaining,
+                'quota_reset_in': round(self.reset_in, 1) if self.reset_in is not None else None,
+                'requests_paced': self.acquired,
+                'total_wait_seconds': round(self.total_wait, 2),
+                'avg_wait_seconds': round(self.total_wait / self.acquired, 3) if self.acquired else 0.0,
+                'last_wait_seconds': round(self.last_wait, 3)
+            }
+
+class ScrapeCheckpoint:
+    """
+    Resumable position in one subreddit listing, kept in a local JSON file.
+    
+    Records the fullname of the last post read from the listing (the cursor
+    passed back as 'after' on resume), the posts that were read but not yet
+    committed, and a count of committed posts. Committed ids are not kept:
+    the cursor is already past them, and a post that moves back below the
+    cursor in a ranked listing is simply written again, which the upserts
+    absorb. That keeps each save proportional to the in-flight posts. The
+    file is rewritten atomically every save_every completed posts and when
+    the run stops.
+    """
+    
+    def __init__(self, path: str, subreddit_name: str, sort_method: str, save_every: int = 10):
+        self.path = path
+        self.subreddit_name = subreddit_name
+        self.sort_method = sort_method
+        self.save_every = save_every
+        self.after: Optional[str] = None
+        self.listed = 0
+        self.in_flight: List[str] = []
+        self.completed = 0
+        self._unsaved = 0
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def default_path(cls, subreddit_name: str, sort_method: str) -> str:
+        return f"scrape_checkpoint_{subreddit_name}_{sort_method}.json"
+    
+    def load(self) -> bool:
+        """Load the checkpoint file. Returns False if there is nothing to resume."""
+        if not os.path.exists(self.path):
+            return False
+        
+        with open(self.path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        
+        if state.get('subreddit') != self.subreddit_name or state.get('sort_method') != self.sort_method:
+            logger.warning(f"Checkpoint {self.path} is for r/{state.get('subreddit')} "
+                           f"({state.get('sort_method')}), ignoring it")
+            return False
+        
+        self.after = state.get('after')
+        self.listed = state.get('listed', 0)
+        self.in_flight = state.get('in_flight', [])
+        completed = state.get('completed', 0)
+        # Older checkpoints stored the committed ids themselves
+        self.completed = len(completed) if isinstance(completed, list) else completed
+        logger.info(f"Resuming r/{self.subreddit_name} ({self.sort_method}) after {self.after}: "
+                    f"{self.completed} posts done, {len(self.in_flight)} to retry")
+        return True
+    
+    def save(self):
+        """Write the checkpoint atomically."""
+        with self._lock:
+            state = {
+                'subreddit': self.subreddit_name,
+                'sort_method': self.sort_method,
+                'after': self.after,
+                'listed': self.listed,
+                'in_flight': list(self.in_flight),
+                'completed': self.completed,
+                'updated_at': datetime.datetime.now().isoformat()
+            }
+            self._unsaved = 0
+        
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.path)
+    
+    def advance(self, post):
+        """Move the listing cursor past a post."""
+        with self._lock:
+            self.after = post.name
+            self.listed += 1
+    
+    def start(self, post_id: str):
+        """Mark a post as read from the listing but not yet committed."""
+        with self._lock:
+            if post_id not in self.in_flight:
+                self.in_flight.append(post_id)
+    
+    def complete(self, post_id: str):
+        """Mark a post as committed, saving every save_every posts."""
+        with self._lock:
+            if post_id in self.in_flight:
+                self.in_flight.remove(post_id)
+            self.completed += 1
+            self._unsaved += 1
+            due = self._unsaved >= self.save_every
+        if due:
+            self.save()
+    
+    def clear(self):
+        """Remove the checkpoint file after a finished run."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class CommentBatch:
+    """
+    Flat, columnar set of comments from one comment forest.
+    
+    Holds one list per database column plus the reply depth of each comment,
+    so a batch can go straight to executemany.
+    """
+    
+    def __init__(self):
+        self.columns: Dict[str, List[Any]] = {name: [] for name in COMMENT_COLUMNS + ('depth',)}
+    
+    def __len__(self) -> int:
+        return len(self.columns['id'])
+    
+    @classmethod
+    def from_records(cls, records: List[tuple]) -> 'CommentBatch':
+        """Build a batch from tuples in COMMENT_COLUMNS order followed by depth."""
+        batch = cls()
+        if records:
+            for name, values in zip(batch.columns, zip(*records)):
+                batch.columns[name] = list(values)
+        return batch
+    
+    @property
+    def ids(self) -> List[str]:
+        return self.columns['id']
+    
+    def extend(self, other: 'CommentBatch'):
+        """Append all comments of another batch."""
+        for name, values in other.columns.items():
+            self.columns[name].extend(values)
+    
+    def without_ids(self, excluded_ids) -> 'CommentBatch':
+        """Return a new batch without the comments whose id is in excluded_ids."""
+        batch = CommentBatch()
+        keep = [i for i, comment_id in enumerate(self.columns['id']) if comment_id not in excluded_ids]
+        for name, values in self.columns.items():
+            batch.columns[name] = [values[i] for i in keep]
+        return batch
+    
+    def insert_params(self) -> List[tuple]:
+        """Return COMMENT_INSERT_QUERY parameter tuples."""
+        return list(zip(*(self.columns[name] for name in COMMENT_COLUMNS)))
+
 class RedditScraper:
-    def __init__(self, subreddit_name: str = "DecidingToBeBetter"):
-        """Initialize Reddit scraper with database and API connections."""
+    def __init__(self, subreddit_name: str = "DecidingToBeBetter", batch_size: int = 500,
+                 max_more_requests: Optional[int] = None,
+                 max_more_seconds: Optional[float] = None, max_more_depth: Optional[int] = None,
+                 more_priority: str = 'count'):
+        """
+        Initialize Reddit scraper with database and API connections.
+        
+        Args:
+            subreddit_name: Subreddit to scrape
+            batch_size: Number of comment rows sent per executemany call
+            max_more_requests: MoreComments expansions allowed per post (None = unlimited)
+            max_more_seconds: Wall time allowed for MoreComments expansion per post (None = unlimited)
+            max_more_depth: Deepest reply level whose MoreComments are expanded (None = unlimited)
+            more_priority: Expand the MoreComments with the largest 'count' first, or the
+                ones under the highest-'score' parent
+        """
         self.reddit = None
         self.db_connection = None
+        self.prepared: Optional[PreparedCursors] = None
         self.subreddit_name = subreddit_name
+        self.batch_size = batch_size
+        self.max_more_requests = max_more_requests
+        self.max_more_seconds = max_more_seconds
+        self.max_more_depth = max_more_depth
+        self.more_priority = more_priority
+        self.rate_limiter: Optional[AdaptiveRateLimiter] = None
+        self.recorder: Optional[ScrapeRecorder] = None
         
     def setup_reddit_connection(self):
         """Set up Reddit API connection using PRAW."""
         try:
-            self.reddit = praw.Reddit(
-                client_id=os.getenv('REDDIT_CLIENT_ID'),
-                client_secret=os.getenv('REDDIT_CLIENT_SECRET'),
-                user_agent=os.getenv('REDDIT_USER_AGENT', 'MindfulnessScaper/1.0')
-            )
+            self.reddit = self.create_reddit_instance()
+            self.rate_limiter = AdaptiveRateLimiter(self.reddit)
             logger.info("Reddit API connection established successfully")
             return True
         except Exception as e:
             logger.error(f"Failed to connect to Reddit API: {e}")
             return False
     
+    @staticmethod
+    def create_reddit_instance():
+        """Create a PRAW instance from the REDDIT_* environment variables."""
+        return praw.Reddit(
+            client_id=os.getenv('REDDIT_CLIENT_ID'),
+            client_secret=os.getenv('REDDIT_CLIENT_SECRET'),
+            user_agent=os.getenv('REDDIT_USER_AGENT', 'MindfulnessScaper/1.0')
+        )
+    
+    def wait_for_api(self):
+        """Wait for the rate limiter before an API call."""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+    
+    def paced_listing(self, listing, page_size: int = 100):
+        """
+        Iterate a PRAW listing, taking a rate limiter token before each page request.
+        
+        Listings (and reddit.info) fetch page_size items per request, so a token
+        is taken up front and again after every page_size items.
+        """
+        self.wait_for_api()
+        for index, item in enumerate(listing, start=1):
+            yield item
+            if index % page_size == 0:
+                self.wait_for_api()
+    
+    def create_database_connection(self):
+        """Borrow a MySQL connection from the shared pool; close() returns it."""
+        return get_connection()
+    
     def setup_database_connection(self):
         """Set up MySQL database connection."""
         try:
-            self.db_connection = mysql.connector.connect(
-                host='localhost',
-                port=3306,
-                database='reddit_mindfulness',
-                user='root',
-                password='admin123',
-                charset='utf8mb4',
-                use_unicode=True
-            )
+            self.db_connection = self.create_database_connection()
+            self.prepared = PreparedCursors(self.db_connection)
             logger.info("Database connection established successfully")
             return True
         except Error as e:
@@ -63,9 +525,32 @@ class RedditScraper:
     
     def close_connections(self):
         """Close database connection."""
+        if self.prepared is not None:
+            self.prepared.close()
+            self.prepared = None
         if self.db_connection and self.db_connection.is_connected():
             self.db_connection.close()
             logger.info("Database connection closed")
+        self.db_connection = None
+    
+    @contextmanager
+    def db_cursor(self, dictionary: bool = False, commit: bool = False):
+        """
+        Cursor on the scraper's own connection, or on one borrowed from the
+        pool for the duration of the block when the scraper holds none.
+        """
+        if self.db_connection is None:
+            with get_pool().cursor(dictionary=dictionary, commit=commit) as cursor:
+                yield cursor
+            return
+        
+        cursor = self.db_connection.cursor(dictionary=dictionary)
+        try:
+            yield cursor
+            if commit:
+                self.db_connection.commit()
+        finally:
+            cursor.close()
     
     def safe_get_attribute(self, obj, attr: str, default=None):
         """Safely get attribute from Reddit object, handling deleted/removed content."""
@@ -82,176 +567,745 @@ class RedditScraper:
         """Convert UTC timestamp to datetime object."""
         return datetime.datetime.fromtimestamp(utc_timestamp)
     
-    def insert_post(self, post) -> bool:
-        """Insert a post into the database."""
-        try:
-            cursor = self.db_connection.cursor()
-            
-            # Prepare post data
-            post_data = {
-                'id': post.id,
-                'title': post.title[:1000] if post.title else None,  # Limit title length
-                'author': self.safe_get_attribute(post, 'author'),
-                'content': post.selftext if hasattr(post, 'selftext') else None,
-                'url': post.url,
-                'score': self.safe_get_attribute(post, 'score', 0),
-                'upvote_ratio': self.safe_get_attribute(post, 'upvote_ratio'),
-                'num_comments': self.safe_get_attribute(post, 'num_comments', 0),
-                'created_utc': self.convert_utc_timestamp(post.created_utc),
-                'subreddit': str(post.subreddit),
-                'is_self': self.safe_get_attribute(post, 'is_self', False),
-                'selftext': post.selftext if hasattr(post, 'selftext') else None,
-                'permalink': self.safe_get_attribute(post, 'permalink')
-            }
-            
-            insert_query = """
-            INSERT IGNORE INTO posts 
-            (id, title, author, content, url, score, upvote_ratio, num_comments, 
-             created_utc, subreddit, is_self, selftext, permalink)
-            VALUES (%(id)s, %(title)s, %(author)s, %(content)s, %(url)s, %(score)s, 
-                    %(upvote_ratio)s, %(num_comments)s, %(created_utc)s, %(subreddit)s, 
-                    %(is_self)s, %(selftext)s, %(permalink)s)
-            """
-            
-            cursor.execute(insert_query, post_data)
-            self.db_connection.commit()
-            cursor.close()
-            
-            logger.info(f"Inserted post: {post.id} - {post.title[:50]}...")
-            return True
-            
-        except Error as e:
-            logger.error(f"Error inserting post {post.id}: {e}")
-            return False
+    def build_post_row(self, post) -> Dict[str, Any]:
+        """Build the database row for a post."""
+        return {
+            'id': post.id,
+            'title': post.title[:1000] if post.title else None,  # Limit title length
+            'author': self.safe_get_attribute(post, 'author'),
+            'content': post.selftext if hasattr(post, 'selftext') else None,
+            'url': post.url,
+            'score': self.safe_get_attribute(post, 'score', 0),
+            'upvote_ratio': self.safe_get_attribute(post, 'upvote_ratio'),
+            'num_comments': self.safe_get_attribute(post, 'num_comments', 0),
+            'created_utc': self.convert_utc_timestamp(post.created_utc),
+            'subreddit': str(post.subreddit),
+            'is_self': self.safe_get_attribute(post, 'is_self', False),
+            'selftext': post.selftext if hasattr(post, 'selftext') else None,
+            'permalink': self.safe_get_attribute(post, 'permalink')
+        }
     
-    def insert_comment(self, comment, post_id: str) -> bool:
-        """Insert a comment into the database."""
-        try:
-            cursor = self.db_connection.cursor()
-            
-            # Skip deleted or removed comments
-            if not hasattr(comment, 'body') or comment.body in ['[deleted]', '[removed]']:
-                return False
-            
-            # Determine parent type and ID
-            parent_type = 'post'
-            parent_id = post_id
-            
-            if hasattr(comment, 'parent_id') and comment.parent_id:
-                parent_id_str = str(comment.parent_id)
-                if parent_id_str.startswith('t1_'):  # Comment parent
-                    parent_type = 'comment'
-                    parent_id = parent_id_str[3:]  # Remove 't1_' prefix
-                elif parent_id_str.startswith('t3_'):  # Post parent
-                    parent_type = 'post'
-                    parent_id = parent_id_str[3:]  # Remove 't3_' prefix
+    def flatten_comment_forest(self, comment_forest, post_id: str, pending_more: Optional[List] = None,
+                               depth: int = 0, raw_sink: Optional[List] = None,
+                               depths: Optional[Dict[str, int]] = None) -> CommentBatch:
+        """
+        Flatten a comment forest breadth-first into a CommentBatch.
+        
+        Iterative, so thread depth is not limited by the recursion limit, and
+        parents always come before their replies. Deleted and removed comments
+        are left out but their replies are kept. MoreComments objects are
+        skipped, or appended to pending_more as (more_comments, depth) pairs
+        when a list is given.
+        
+        Args:
+            comment_forest: Top-level comments (a CommentForest or any iterable)
+            post_id: Id of the post the comments belong to
+            pending_more: Optional list collecting unexpanded MoreComments
+            depth: Reply depth of the top-level comments
+            raw_sink: Optional list collecting raw_thing() of every comment visited, for recording
+            depths: Optional map of comment id -> depth, read and updated. When given,
+                each node's depth is its parent's plus one (falling back to the level
+                depth for unknown parents), which is needed for flat lists such as
+                MoreComments.comments() that mix several reply levels.
+        """
+        records = []
+        append = records.append
+        more_type = praw.models.MoreComments
+        fromtimestamp = datetime.datetime.fromtimestamp
+        
+        # Walk one reply level at a time so depth needs no per-node bookkeeping,
+        # unless a depths map asks for depths derived from parent ids
+        level = list(comment_forest)
+        while level:
+            next_level = []
+            for comment in level:
+                comment_depth = depth
+                if depths is not None:
+                    parent_name = str(getattr(comment, 'parent_id', None) or '')
+                    if parent_name.startswith('t3_'):
+                        comment_depth = 0
+                    elif parent_name[3:] in depths:
+                        comment_depth = depths[parent_name[3:]] + 1
+                
+                if isinstance(comment, more_type):
+                    if pending_more is not None:
+                        pending_more.append((comment, comment_depth))
+                    continue
+                
+                if depths is not None:
+                    depths[comment.id] = comment_depth
+                
+                replies = getattr(comment, 'replies', None)
+                if replies:
+                    next_level.extend(replies)
+                
+                if raw_sink is not None:
+                    raw_sink.append(raw_thing(comment))
+                
+                # Skip deleted or removed comments
+                body = getattr(comment, 'body', None)
+                if body is None or body in ('[deleted]', '[removed]'):
+                    continue
+                
+                parent_type = 'post'
+                parent_id = post_id
+                parent_fullname = getattr(comment, 'parent_id', None)
+                if parent_fullname:
+                    parent_fullname = str(parent_fullname)
+                    if parent_fullname.startswith('t1_'):  # Comment parent
+                        parent_type = 'comment'
+                        parent_id = parent_fullname[3:]
+                    elif parent_fullname.startswith('t3_'):  # Post parent
+                        parent_id = parent_fullname[3:]
+                
+                author = getattr(comment, 'author', None)
+                if author:
+                    author = str(author)
+                    if author == '[deleted]':
+                        author = None
+                
+                append((comment.id, post_id, author, body, getattr(comment, 'score', 0),
+                        fromtimestamp(comment.created_utc), parent_type, parent_id,
+                        getattr(comment, 'permalink', None), comment_depth))
             
-            comment_data = {
-                'id': comment.id,
-                'post_id': post_id,
-                'author': self.safe_get_attribute(comment, 'author'),
-                'body': comment.body,
-                'score': self.safe_get_attribute(comment, 'score', 0),
-                'created_utc': self.convert_utc_timestamp(comment.created_utc),
-                'parent_type': parent_type,
-                'parent_id': parent_id,
-                'permalink': self.safe_get_attribute(comment, 'permalink')
-            }
+            level = next_level
+            depth += 1
+        
+        return CommentBatch.from_records(records)
+    
+    def get_listing(self, sort_method: str, limit: int, after: Optional[str] = None):
+        """Return the subreddit listing generator for a sort method, optionally starting after a fullname."""
+        subreddit = self.reddit.subreddit(self.subreddit_name)
+        params = {'after': after} if after else None
+        
+        # Get posts based on sort method
+        if sort_method == 'hot':
+            return subreddit.hot(limit=limit, params=params)
+        elif sort_method == 'new':
+            return subreddit.new(limit=limit, params=params)
+        elif sort_method == 'top':
+            return subreddit.top(limit=limit, params=params)
+        elif sort_method == 'rising':
+            return subreddit.rising(limit=limit, params=params)
+        return subreddit.hot(limit=limit, params=params)
+    
+    def load_watermark(self, sort_method: str) -> Optional[Dict[str, Any]]:
+        """Load the newest post seen by the last completed run of this listing."""
+        with self.db_cursor(dictionary=True) as cursor:
+            cursor.execute("""
+                SELECT newest_created_utc, newest_fullname
+                FROM scrape_watermarks
+                WHERE subreddit = %s AND sort_method = %s
+            """, (self.subreddit_name, sort_method))
+            return cursor.fetchone()
+    
+    def save_watermark(self, sort_method: str, newest_post):
+        """Persist the newest post seen by this run of the listing."""
+        with self.db_cursor(commit=True) as cursor:
+            cursor.execute("""
+                INSERT INTO scrape_watermarks (subreddit, sort_method, newest_created_utc, newest_fullname)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    newest_created_utc = VALUES(newest_created_utc),
+                    newest_fullname = VALUES(newest_fullname)
+            """, (self.subreddit_name, sort_method,
+                  self.convert_utc_timestamp(newest_post.created_utc), newest_post.name))
+    
+    def load_known_comment_counts(self) -> Dict[str, int]:
+        """Load num_comments for every stored post of this subreddit."""
+        with self.db_cursor() as cursor:
+            cursor.execute("SELECT id, num_comments FROM posts WHERE subreddit = %s", (self.subreddit_name,))
+            return {post_id: num_comments for post_id, num_comments in cursor.fetchall()}
+    
+    def iter_posts(self, sort_method: str, limit: int, incremental: bool = False, stop_after_known: int = 25,
+                   checkpoint: Optional[ScrapeCheckpoint] = None):
+        """
+        Yield posts from a listing, skipping ones that have not changed when incremental.
+        
+        In incremental mode a post is skipped when it is already stored with the
+        same num_comments, so its comment tree is never fetched. Paging stops at
+        known territory: for 'new', the first post at or before the stored
+        watermark; for the score-ordered listings, after stop_after_known
+        consecutive unchanged posts. The watermark only advances when the
+        listing is consumed to the end, so an interrupted run is repeated.
+        
+        Args:
+            sort_method: 'hot', 'new', 'top', 'rising'
+            limit: Maximum number of posts to page through
+            incremental: Skip unchanged posts and stop at known territory
+            stop_after_known: Consecutive unchanged posts that end a non-'new' listing
+            checkpoint: Resume from and record progress in this checkpoint. Posts that
+                were in flight when it was saved are yielded first, then the listing
+                continues after the saved cursor.
+        """
+        if checkpoint is not None:
+            if checkpoint.in_flight:
+                fullnames = [f"t3_{post_id}" for post_id in checkpoint.in_flight]
+                yield from self.paced_listing(self.reddit.info(fullnames=fullnames))
+            listing = self.get_listing(sort_method, max(limit - checkpoint.listed, 0), after=checkpoint.after)
+        else:
+            listing = self.get_listing(sort_method, limit)
+        
+        watermark = self.load_watermark(sort_method) if incremental else None
+        known_counts = self.load_known_comment_counts() if incremental else {}
+        newest_post = None
+        consecutive_known = 0
+        skipped = 0
+        
+        for post in self.paced_listing(listing):
+            if checkpoint is not None:
+                checkpoint.advance(post)
             
-            insert_query = """
-            INSERT IGNORE INTO comments 
-            (id, post_id, author, body, score, created_utc, parent_type, parent_id, permalink)
-            VALUES (%(id)s, %(post_id)s, %(author)s, %(body)s, %(score)s, 
-                    %(created_utc)s, %(parent_type)s, %(parent_id)s, %(permalink)s)
-            """
+            if not incremental:
+                if checkpoint is not None:
+                    checkpoint.start(post.id)
+                yield post
+                continue
             
-            cursor.execute(insert_query, comment_data)
-            self.db_connection.commit()
-            cursor.close()
+            if newest_post is None or post.created_utc > newest_post.created_utc:
+                newest_post = post
             
-            logger.debug(f"Inserted comment: {comment.id}")
-            return True
+            if sort_method == 'new' and watermark and (
+                    post.name == watermark['newest_fullname'] or
+                    self.convert_utc_timestamp(post.created_utc) < watermark['newest_created_utc']):
+                logger.info(f"Reached watermark {watermark['newest_fullname']} in r/{self.subreddit_name}/new")
+                break
             
-        except Error as e:
-            logger.error(f"Error inserting comment {comment.id}: {e}")
-            return False
-    
-    def process_comment_tree(self, comment_forest, post_id: str):
-        """Recursively process all comments in a comment tree."""
-        comment_count = 0
-        
-        for comment in comment_forest:
-            # Skip MoreComments objects
-            if isinstance(comment, praw.models.MoreComments):
+            if known_counts.get(post.id) == self.safe_get_attribute(post, 'num_comments', 0):
+                skipped += 1
+                consecutive_known += 1
+                if sort_method != 'new' and consecutive_known >= stop_after_known:
+                    logger.info(f"{consecutive_known} unchanged posts in a row in "
+                                f"r/{self.subreddit_name}/{sort_method}, stopping")
+                    break
                 continue
-                
-            # Insert the comment
-            if self.insert_comment(comment, post_id):
-                comment_count += 1
             
-            # Process replies recursively
-            if hasattr(comment, 'replies') and comment.replies:
-                comment_count += self.process_comment_tree(comment.replies, post_id)
+            consecutive_known = 0
+            if checkpoint is not None:
+                checkpoint.start(post.id)
+            yield post
+        
+        if not incremental:
+            return
         
-        return comment_count
+        logger.info(f"Incremental r/{self.subreddit_name}/{sort_method}: skipped {skipped} unchanged posts")
+        if newest_post is not None:
+            self.save_watermark(sort_method, newest_post)
     
-    def scrape_subreddit(self, limit: int = 1000, sort_method: str = 'hot'):
+    def create_checkpoint(self, sort_method: str, resume: bool, checkpoint_path: Optional[str] = None,
+                          save_every: int = 10) -> ScrapeCheckpoint:
+        """Create the checkpoint for a listing, loading the saved one when resuming."""
+        path = checkpoint_path or ScrapeCheckpoint.default_path(self.subreddit_name, sort_method)
+        checkpoint = ScrapeCheckpoint(path, self.subreddit_name, sort_method, save_every=save_every)
+        if resume and not checkpoint.load():
+            logger.info(f"No checkpoint to resume at {path}, starting from the top")
+        return checkpoint
+    
+    def scrape_subreddit(self, limit: int = 1000, sort_method: str = 'hot', incremental: bool = False,
+                         resume: bool = False, checkpoint_path: Optional[str] = None):
         """
         Scrape posts and comments from the mindfulness subreddit.
         
         Args:
             limit: Number of posts to scrape
             sort_method: 'hot', 'new', 'top', 'rising'
+            incremental: Skip posts whose comment count has not changed since the last scrape
+            resume: Continue from the last checkpoint instead of the top of the listing
+            checkpoint_path: Checkpoint file (default scrape_checkpoint_<subreddit>_<sort>.json)
         """
         if not self.reddit or not self.db_connection:
             logger.error("Reddit API or database connection not established")
             return
         
+        checkpoint = self.create_checkpoint(sort_method, resume, checkpoint_path)
+        finished = False
+        
         try:
-            subreddit = self.reddit.subreddit(self.subreddit_name)
             logger.info(f"Starting to scrape r/{self.subreddit_name} - {sort_method} posts (limit: {limit})")
-            
-            # Get posts based on sort method
-            if sort_method == 'hot':
-                posts = subreddit.hot(limit=limit)
-            elif sort_method == 'new':
-                posts = subreddit.new(limit=limit)
-            elif sort_method == 'top':
-                posts = subreddit.top(limit=limit)
-            elif sort_method == 'rising':
-                posts = subreddit.rising(limit=limit)
-            else:
-                posts = subreddit.hot(limit=limit)
+            posts = self.iter_posts(sort_method, limit, incremental=incremental, checkpoint=checkpoint)
             
             total_posts = 0
             total_comments = 0
             
             for post in posts:
                 try:
-                    # Insert post
-                    if self.insert_post(post):
+                    # Get all comments for this post, within the expansion budget; the
+                    # post and its comments are committed together in one transaction
+                    post_row, comment_batch, skipped_rows = self.fetch_post_rows(post)
+                    if self.write_post_rows(self.db_connection, post_row, comment_batch, skipped_rows):
+                        checkpoint.complete(post.id)
                         total_posts += 1
+                        total_comments += len(comment_batch)
                         
-                        # Get all comments for this post
-                        post.comments.replace_more(limit=None)  # Load all comments
-                        comment_count = self.process_comment_tree(post.comments, post.id)
-                        total_comments += comment_count
-                        
-                        logger.info(f"Post {post.id}: {comment_count} comments processed")
-                        
-                        # Small delay to be respectful to Reddit's servers
-                        time.sleep(0.5)
+                        logger.info(f"Post {post.id}: {len(comment_batch)} comments processed")
                     
                 except Exception as e:
                     logger.error(f"Error processing post {post.id}: {e}")
                     continue
             
             logger.info(f"Scraping completed! Total posts: {total_posts}, Total comments: {total_comments}")
+            if self.rate_limiter is not None:
+                logger.info(f"Rate limiter: {self.rate_limiter.metrics()}")
+            finished = True
+            
+        except Exception as e:
+            logger.error(f"Error during scraping: {e}")
+        finally:
+            # Keep the checkpoint for --resume unless the listing was consumed completely
+            # and no post failed to write (failed posts stay in in_flight to be retried)
+            if finished and not checkpoint.in_flight:
+                checkpoint.clear()
+            else:
+                checkpoint.save()
+    
+    def write_post_rows(self, connection, post_row: Dict[str, Any], comment_batch: CommentBatch,
+                        skipped_rows: Optional[List[Dict[str, Any]]] = None, max_retries: int = 3) -> bool:
+        """
+        Write a post, its comments and its skipped MoreComments on the given connection in one transaction.
+        
+        skipped_rows come from a fresh expansion of the post's comments, so they
+        replace the post's earlier skip records (an empty list clears them).
+        None leaves the skip records alone. A transaction that loses a deadlock
+        or lock wait is rolled back and replayed up to max_retries times.
+        """
+        comment_params = comment_batch.insert_params()
+        for attempt in range(max_retries + 1):
+            cursor = connection.cursor()
+            try:
+                cursor.execute(POST_INSERT_QUERY, post_row)
+                for start in range(0, len(comment_params), self.batch_size):
+                    cursor.executemany(COMMENT_INSERT_QUERY, comment_params[start:start + self.batch_size])
+                if skipped_rows is not None:
+                    cursor.execute("DELETE FROM skipped_more_comments WHERE post_id = %s", (post_row['id'],))
+                if skipped_rows:
+                    cursor.executemany(SKIPPED_MORE_INSERT_QUERY, skipped_rows)
+                connection.commit()
+                return True
+            except Error as e:
+                connection.rollback()
+                if getattr(e, 'errno', None) in RETRYABLE_WRITE_ERRNOS and attempt < max_retries:
+                    logger.warning(f"Post {post_row['id']}: {e}, retrying ({attempt + 1}/{max_retries})")
+                    time.sleep(0.05 * 2 ** attempt)
+                    continue
+                logger.error(f"Error writing post {post_row['id']}: {e}")
+                return False
+            finally:
+                cursor.close()
+        return False
+    
+    def build_skipped_more_row(self, more_comments, post_id: str, depth: int) -> Dict[str, Any]:
+        """Build the backfill record for a MoreComments object that was not expanded."""
+        return {
+            'post_id': post_id,
+            'parent_id': str(more_comments.parent_id)[3:],
+            'more_count': more_comments.count,
+            'depth': depth,
+            'children': ','.join(more_comments.children)
+        }
+    
+    def expand_comment_forest(self, post, unbounded: bool = False) -> Tuple[CommentBatch, List[Dict[str, Any]]]:
+        """
+        Collect a post's comments, expanding MoreComments within the per-post budget.
+        
+        MoreComments are expanded one rate-limited request at a time, highest
+        priority first, until the request count or wall time budget runs out;
+        without a budget every one is expanded. PRAW's replace_more is not used:
+        it sends its requests outside the rate limiter, and with a limit it drops
+        the MoreComments it skips from the tree. MoreComments that are deeper than
+        max_more_depth, still pending when the budget runs out, or that fail to
+        load are returned as skipped rows for a later backfill pass.
+        
+        Args:
+            post: Submission whose comments to collect
+            unbounded: Ignore the configured budget, e.g. when backfilling
+        
+        Returns:
+            (comment_batch, skipped_more_rows)
+        """
+        # Loading the comment forest is one request
+        self.wait_for_api()
+        raw_comments = [] if self.recorder is not None else None
+        max_requests = None if unbounded else self.max_more_requests
+        max_seconds = None if unbounded else self.max_more_seconds
+        max_depth = None if unbounded else self.max_more_depth
+        
+        pending = []
+        # MoreComments.comments() returns a flat list spanning several reply levels, so
+        # depths are tracked per comment id; Reddit lists parents before their replies
+        depths = {}
+        batch = self.flatten_comment_forest(post.comments, post.id, pending_more=pending, raw_sink=raw_comments,
+                                            depths=depths)
+        seen_ids = set(batch.ids)
+        scores = dict(zip(batch.ids, batch.columns['score']))
+        post_score = self.safe_get_attribute(post, 'score', 0)
+        
+        heap = []
+        sequence = 0
+        
+        def push(more_comments, depth):
+            nonlocal sequence
+            if self.more_priority == 'score':
+                parent = str(more_comments.parent_id)
+                priority = post_score if parent.startswith('t3_') else scores.get(parent[3:], 0)
+            else:
+                priority = more_comments.count
+            heapq.heappush(heap, (-priority, sequence, more_comments, depth))
+            sequence += 1
+        
+        for more_comments, depth in pending:
+            push(more_comments, depth)
+        
+        skipped = []
+        requests_made = 0
+        started = time.time()
+        
+        while heap:
+            _, _, more_comments, depth = heapq.heappop(heap)
+            
+            out_of_budget = (
+                (max_requests is not None and requests_made >= max_requests) or
+                (max_seconds is not None and time.time() - started >= max_seconds)
+            )
+            if out_of_budget or (max_depth is not None and depth > max_depth):
+                skipped.append(self.build_skipped_more_row(more_comments, post.id, depth))
+                continue
             
+            try:
+                self.wait_for_api()
+                forest = more_comments.comments()
+                requests_made += 1
+            except Exception as e:
+                logger.warning(f"Could not expand MoreComments under {more_comments.parent_id}: {e}")
+                skipped.append(self.build_skipped_more_row(more_comments, post.id, depth))
+                continue
+            
+            new_pending = []
+            new_batch = self.flatten_comment_forest(forest, post.id, pending_more=new_pending, depth=depth,
+                                                    raw_sink=raw_comments, depths=depths)
+            new_batch = new_batch.without_ids(seen_ids)
+            seen_ids.update(new_batch.ids)
+            scores.update(zip(new_batch.ids, new_batch.columns['score']))
+            batch.extend(new_batch)
+            for new_more, new_depth in new_pending:
+                push(new_more, new_depth)
+        
+        if skipped:
+            logger.info(f"Post {post.id}: {requests_made} MoreComments expanded, {len(skipped)} left for backfill")
+        if self.recorder is not None:
+            self.recorder.record(post, raw_comments)
+        return batch, skipped
+    
+    def fetch_post_rows(self, post):
+        """
+        Load a post's comment forest and turn it into rows.
+        
+        Returns:
+            (post_row, comment_batch, skipped_more_rows)
+        """
+        post_row = self.build_post_row(post)
+        comment_batch, skipped_rows = self.expand_comment_forest(post)
+        return post_row, comment_batch, skipped_rows
+    
+    def _writer_loop(self, connection, write_queue: queue.Queue):
+        """Drain fetched posts from the queue into MySQL until a None sentinel arrives."""
+        while True:
+            item = write_queue.get()
+            try:
+                if item is None:
+                    break
+                
+                post_row, comment_batch, skipped_rows, progress = item
+                if self.write_post_rows(connection, post_row, comment_batch, skipped_rows):
+                    progress.record_write(post_row['id'], len(comment_batch))
+                    logger.info(f"Post {post_row['id']}: {len(comment_batch)} comments written")
+            except Exception as e:
+                logger.error(f"Writer error: {e}")
+            finally:
+                write_queue.task_done()
+    
+    def start_writers(self, num_writers: int = 1, queue_size: int = 50):
+        """
+        Start writer threads draining a bounded queue into MySQL.
+        
+        Each writer borrows its own connection from the pool. Queue items are
+        (post_row, comment_batch, skipped_rows, progress) tuples.
+        
+        Returns:
+            (write_queue, writers, connections), or None if a connection could not be opened
+        """
+        connections = []
+        try:
+            for _ in range(num_writers):
+                connections.append(self.create_database_connection())
+        except Error as e:
+            logger.error(f"Failed to open writer connections: {e}")
+            for connection in connections:
+                connection.close()
+            return None
+        
+        write_queue = queue.Queue(maxsize=queue_size)
+        writers = [
+            threading.Thread(
+                target=self._writer_loop,
+                args=(connection, write_queue),
+                name=f"scrape-writer-{i}",
+                daemon=True
+            )
+            for i, connection in enumerate(connections)
+        ]
+        for writer in writers:
+            writer.start()
+        
+        return write_queue, writers, connections
+    
+    def stop_writers(self, write_queue: queue.Queue, writers: List[threading.Thread], connections: List):
+        """Flush the queue, stop the writer threads and close their connections."""
+        # Writers finish everything already queued before reading their sentinel
+        for _ in writers:
+            write_queue.put(None)
+        for writer in writers:
+            writer.join()
+        for connection in connections:
+            if connection.is_connected():
+                connection.close()
+    
+    def scrape_subreddit_pipelined(self, limit: int = 1000, sort_method: str = 'hot',
+                                   queue_size: int = 50, num_writers: int = 1, incremental: bool = False,
+                                   resume: bool = False, checkpoint_path: Optional[str] = None):
+        """
+        Scrape with Reddit fetches and MySQL writes running concurrently.
+        
+        The calling thread fetches posts and their comment forests and turns them
+        into rows; writer threads, each with its own connection, drain a bounded
+        queue into MySQL. When the writers fall behind, the full queue blocks the
+        fetcher. On exit the queue is drained before the writers stop.
+        
+        Args:
+            limit: Number of posts to scrape
+            sort_method: 'hot', 'new', 'top', 'rising'
+            queue_size: Maximum number of fetched posts waiting to be written
+            num_writers: Number of writer threads
+            incremental: Skip posts whose comment count has not changed since the last scrape
+            resume: Continue from the last checkpoint instead of the top of the listing
+            checkpoint_path: Checkpoint file (default scrape_checkpoint_<subreddit>_<sort>.json)
+        """
+        if not self.reddit:
+            logger.error("Reddit API connection not established")
+            return
+        
+        # PRAW objects are only touched on this thread; writers receive plain rows
+        started = self.start_writers(num_writers, queue_size)
+        if started is None:
+            return
+        write_queue, writers, connections = started
+        progress = ScrapeProgress(f"r/{self.subreddit_name} ({sort_method})")
+        progress.checkpoint = self.create_checkpoint(sort_method, resume, checkpoint_path)
+        finished = False
+        
+        try:
+            logger.info(f"Starting pipelined scrape of r/{self.subreddit_name} - {sort_method} posts "
+                        f"(limit: {limit}, writers: {num_writers})")
+            
+            for post in self.iter_posts(sort_method, limit, incremental=incremental,
+                                        checkpoint=progress.checkpoint):
+                try:
+                    post_row, comment_batch, skipped_rows = self.fetch_post_rows(post)
+                except Exception as e:
+                    logger.error(f"Error fetching post {post.id}: {e}")
+                    continue
+                
+                progress.record_fetch()
+                # Blocks while the queue is full
+                write_queue.put((post_row, comment_batch, skipped_rows, progress))
+            
+            finished = True
+                
         except Exception as e:
             logger.error(f"Error during scraping: {e}")
+        finally:
+            self.stop_writers(write_queue, writers, connections)
+            # Writers have drained the queue, so in_flight now only holds posts that failed
+            if finished and not progress.checkpoint.in_flight:
+                progress.checkpoint.clear()
+            else:
+                progress.checkpoint.save()
+            logger.info(f"Scraping completed! Total posts: {progress.posts_written}, "
+                        f"Total comments: {progress.comments_written}")
+            if self.rate_limiter is not None:
+                logger.info(f"Rate limiter: {self.rate_limiter.metrics()}")
     
-    def run(self, limit: int = 100, sort_method: str = 'hot'):
+    def load_stored_comment_counts(self, since: datetime.datetime) -> Dict[str, int]:
+        """
+        Load the num_comments recorded at the last scrape for every post created since a date.
+        
+        Stored comment rows are not counted instead: deleted and removed comments
+        are never stored but are included in num_comments, so the two rarely match.
+        
+        Args:
+            since: Only posts created at or after this time
+        """
+        cursor = self.db_connection.cursor()
+        try:
+            cursor.execute("""
+                SELECT id, num_comments
+                FROM posts
+                WHERE subreddit = %s AND created_utc >= %s
+            """, (self.subreddit_name, since))
+            return {post_id: count for post_id, count in cursor.fetchall()}
+        finally:
+            cursor.close()
+    
+    def load_stored_comment_ids(self, post_id: str) -> set:
+        """Load the ids of comments already stored for a post."""
+        rows = self.prepared.fetchall("SELECT id FROM comments WHERE post_id = %s", (post_id,))
+        return {row[0] for row in rows}
+    
+    def refresh_comments(self, max_age_days: int = 7, info_batch_size: int = 100):
+        """
+        Fetch new comments for stored posts whose comment count has changed.
+        
+        Live counts for recent posts are read in batches through reddit.info(),
+        which costs one request per info_batch_size posts. Only posts whose live
+        num_comments differs from the stored count get their comment forest
+        expanded, and only comment ids that are not stored yet are inserted.
+        
+        Args:
+            max_age_days: Refresh posts created within this many days
+            info_batch_size: Posts per reddit.info() request (100 is the API maximum)
+        
+        Returns:
+            (posts_refreshed, comments_added)
+        """
+        if not self.reddit or not self.db_connection:
+            logger.error("Reddit API or database connection not established")
+            return 0, 0
+        
+        since = datetime.datetime.now() - datetime.timedelta(days=max_age_days)
+        stored_counts = self.load_stored_comment_counts(since)
+        logger.info(f"Checking {len(stored_counts)} posts from r/{self.subreddit_name} for new comments")
+        
+        post_ids = list(stored_counts)
+        posts_refreshed = 0
+        comments_added = 0
+        
+        for start in range(0, len(post_ids), info_batch_size):
+            fullnames = [f"t3_{post_id}" for post_id in post_ids[start:start + info_batch_size]]
+            self.wait_for_api()
+            
+            for post in self.reddit.info(fullnames=fullnames):
+                live_count = self.safe_get_attribute(post, 'num_comments', 0)
+                if live_count == stored_counts.get(post.id):
+                    continue
+                
+                try:
+                    post_row, comment_batch, skipped_rows = self.fetch_post_rows(post)
+                    new_rows = comment_batch.without_ids(self.load_stored_comment_ids(post.id))
+                    
+                    if self.write_post_rows(self.db_connection, post_row, new_rows, skipped_rows):
+                        posts_refreshed += 1
+                        comments_added += len(new_rows)
+                        logger.info(f"Post {post.id}: {stored_counts.get(post.id)} -> {live_count} comments, "
+                                    f"{len(new_rows)} new")
+                except Exception as e:
+                    logger.error(f"Error refreshing post {post.id}: {e}")
+                    continue
+        
+        logger.info(f"Refresh completed! Posts refreshed: {posts_refreshed}, Comments added: {comments_added}")
+        return posts_refreshed, comments_added
+    
+    def backfill_skipped_comments(self, max_posts: int = 100):
+        """
+        Complete comment trees that were cut short by the expansion budget.
+        
+        Posts with recorded skipped MoreComments are fetched again and expanded
+        without a budget, missing comments are inserted and the skip
+        records are cleared.
+        
+        Args:
+            max_posts: Maximum number of posts to backfill in this pass
+        
+        Returns:
+            Number of comments added
+        """
+        if not self.reddit or not self.db_connection:
+            logger.error("Reddit API or database connection not established")
+            return 0
+        
+        cursor = self.db_connection.cursor()
+        cursor.execute("""
+            SELECT s.post_id
+            FROM skipped_more_comments s
+            JOIN posts p ON p.id = s.post_id
+            WHERE p.subreddit = %s
+            GROUP BY s.post_id
+            ORDER BY SUM(s.more_count) DESC
+            LIMIT %s
+        """, (self.subreddit_name, max_posts))
+        post_ids = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+        
+        logger.info(f"Backfilling {len(post_ids)} posts with skipped comment subtrees")
+        comments_added = 0
+        
+        for post_id in post_ids:
+            try:
+                post = self.reddit.submission(id=post_id)
+                comment_batch, skipped_rows = self.expand_comment_forest(post, unbounded=True)
+                new_rows = comment_batch.without_ids(self.load_stored_comment_ids(post_id))
+                
+                # Replaces the old skip records; subtrees that failed to load again are recorded anew
+                if not self.write_post_rows(self.db_connection, self.build_post_row(post), new_rows, skipped_rows):
+                    continue
+                
+                comments_added += len(new_rows)
+                logger.info(f"Post {post_id}: backfilled {len(new_rows)} comments")
+            except Exception as e:
+                logger.error(f"Error backfilling post {post_id}: {e}")
+                continue
+        
+        logger.info(f"Backfill completed! Comments added: {comments_added}")
+        return comments_added
+    
+    def replay(self, paths: List[str], num_writers: int = 1, queue_size: int = 50) -> Dict[str, Any]:
+        """
+        Ingest recorded posts into MySQL without touching the Reddit API.
+        
+        Recordings go through the same row building, flattening and writer
+        pool as a live pipelined scrape, so this doubles as an ingestion
+        benchmark and a way to re-ingest history.
+        
+        Args:
+            paths: Files written by ScrapeRecorder
+            num_writers: Number of writer threads
+            queue_size: Maximum number of posts waiting to be written
+        
+        Returns:
+            Progress summary with throughput
+        """
+        started = self.start_writers(num_writers, queue_size)
+        if started is None:
+            return {}
+        write_queue, writers, connections = started
+        progress = ScrapeProgress(f"replay of {len(paths)} file(s)")
+        
+        try:
+            for post in ReplaySource(paths):
+                post_row = self.build_post_row(post)
+                comment_batch = self.flatten_comment_forest(post.comments, post.id)
+                progress.record_fetch()
+                write_queue.put((post_row, comment_batch, None, progress))
+        except Exception as e:
+            logger.error(f"Error during replay: {e}")
+        finally:
+            self.stop_writers(write_queue, writers, connections)
+        
+        summary = progress.summary()
+        logger.info(f"Replay completed! {summary}")
+        return summary
+    
+    def run(self, limit: int = 100, sort_method: str = 'hot', pipelined: bool = False,
+            queue_size: int = 50, num_writers: int = 1, incremental: bool = False, resume: bool = False,
+            record_path: Optional[str] = None):
         """Main method to run the scraper."""
         logger.info("Starting Reddit scraper for r/mindfulness")
         
@@ -262,22 +1316,274 @@ class RedditScraper:
         if not self.setup_database_connection():
             return
         
+        if record_path:
+            self.recorder = ScrapeRecorder(record_path)
+        
         try:
             # Run the scraping
-            self.scrape_subreddit(limit=limit, sort_method=sort_method)
+            if pipelined:
+                self.scrape_subreddit_pipelined(limit=limit, sort_method=sort_method,
+                                                queue_size=queue_size, num_writers=num_writers,
+                                                incremental=incremental, resume=resume)
+            else:
+                self.scrape_subreddit(limit=limit, sort_method=sort_method, incremental=incremental,
+                                      resume=resume)
         finally:
             # Clean up connections
+            if self.recorder is not None:
+                self.recorder.close()
+                self.recorder = None
             self.close_connections()
             logger.info("Scraper finished")
 
-def main():
-    """Main function to run the scraper."""
+class MultiSubredditScheduler:
+    """
+    Scrape several subreddits and sort methods in one process.
+    
+    Each (subreddit, sort) listing is walked by its own fetcher thread with
+    its own scraper and PRAW instance, since PRAW objects never cross threads.
+    All fetchers share one AdaptiveRateLimiter, so they draw on one API
+    rate-limit budget; while one fetcher waits on a response the others keep
+    the budget busy. Fetched rows go to a shared pool of writer threads.
+    """
+    
+    def __init__(self, subreddit_names: List[str], sort_methods: List[str] = None,
+                 limit: int = 1000, num_writers: int = 2,
+                 queue_size: int = 100, batch_size: int = 500, incremental: bool = False,
+                 **scraper_options):
+        """
+        Args:
+            subreddit_names: Subreddits to scrape
+            sort_methods: Listings to walk for each subreddit ('hot', 'new', 'top', 'rising')
+            limit: Number of posts per subreddit listing
+            num_writers: Number of MySQL writer threads
+            queue_size: Maximum number of fetched posts waiting to be written
+            batch_size: Comment rows per executemany call
+            incremental: Skip posts whose comment count has not changed since the last scrape
+            scraper_options: Extra RedditScraper arguments, e.g. the MoreComments budget
+        """
+        self.subreddit_names = subreddit_names
+        self.sort_methods = sort_methods or ['hot']
+        self.limit = limit
+        self.num_writers = num_writers
+        self.queue_size = queue_size
+        self.incremental = incremental
+        # One scraper per listing, keyed like the progress counters
+        self.listings: List[Tuple[str, RedditScraper, str]] = []
+        for name in subreddit_names:
+            for sort_method in self.sort_methods:
+                key = f"r/{name} ({sort_method})"
+                scraper = RedditScraper(name, batch_size=batch_size, **scraper_options)
+                self.listings.append((key, scraper, sort_method))
+        self.scrapers = {key: scraper for key, scraper, _ in self.listings}
+        self.progress: Dict[str, ScrapeProgress] = {}
+        self.stop_event = threading.Event()
+        # The same post often shows up in several listings of one subreddit
+        self.seen_post_ids = set()
+        self.fetched = 0
+        self._lock = threading.Lock()
+    
+    def setup_reddit_connection(self) -> bool:
+        """Give every listing scraper its own PRAW instance, all paced by one shared rate limiter."""
+        lead = next(iter(self.scrapers.values()))
+        if not lead.setup_reddit_connection():
+            return False
+        try:
+            for scraper in self.scrapers.values():
+                if scraper is not lead:
+                    scraper.reddit = RedditScraper.create_reddit_instance()
+                    lead.rate_limiter.watch(scraper.reddit)
+                scraper.rate_limiter = lead.rate_limiter
+        except Exception as e:
+            logger.error(f"Failed to connect to Reddit API: {e}")
+            return False
+        return True
+    
+    def log_progress(self):
+        """Log per-listing counters and throughput."""
+        for progress in self.progress.values():
+            summary = progress.summary()
+            logger.info(
+                f"{summary['name']}: {summary['posts_written']}/{summary['posts_fetched']} posts written, "
+                f"{summary['comments_written']} comments, {summary['posts_per_minute']} posts/min"
+            )
+        
+        rate_limiter = next(iter(self.scrapers.values())).rate_limiter
+        if rate_limiter is not None:
+            logger.info(f"Rate limiter: {rate_limiter.metrics()}")
+    
+    def _fetch_listing(self, key: str, scraper: RedditScraper, sort_method: str,
+                       write_queue: queue.Queue, progress_interval: int):
+        """Fetcher thread: walk one listing and queue each new post's rows for the writers."""
+        progress = self.progress[key]
+        try:
+            for post in scraper.iter_posts(sort_method, self.limit, incremental=self.incremental):
+                if self.stop_event.is_set():
+                    return
+                
+                with self._lock:
+                    if post.id in self.seen_post_ids:
+                        continue
+                    self.seen_post_ids.add(post.id)
+                
+                try:
+                    post_row, comment_batch, skipped_rows = scraper.fetch_post_rows(post)
+                except Exception as e:
+                    logger.error(f"{key}: error fetching post {post.id}: {e}")
+                    continue
+                
+                progress.record_fetch()
+                write_queue.put((post_row, comment_batch, skipped_rows, progress))
+                
+                with self._lock:
+                    self.fetched += 1
+                    log_now = self.fetched % progress_interval == 0
+                if log_now:
+                    self.log_progress()
+            
+            logger.info(f"{key}: listing exhausted")
+        except Exception as e:
+            logger.error(f"{key}: listing failed, dropping it: {e}")
+    
+    def run(self, progress_interval: int = 50) -> Dict[str, Dict[str, Any]]:
+        """
+        Scrape all listings concurrently, one fetcher thread each.
+        
+        Args:
+            progress_interval: Log progress every this many fetched posts
+        
+        Returns:
+            Per-listing progress summaries
+        """
+        logger.info(f"Starting scheduler for {len(self.subreddit_names)} subreddits "
+                    f"({', '.join(self.sort_methods)})")
+        
+        if not self.setup_reddit_connection():
+            return {}
+        
+        # Writers hold a connection each; incremental listings borrow one briefly to read
+        # and save their watermark, so size the pool for all of them at once
+        get_pool(pool_size=self.num_writers + len(self.listings))
+        
+        lead = next(iter(self.scrapers.values()))
+        started = lead.start_writers(self.num_writers, self.queue_size)
+        if started is None:
+            return {}
+        write_queue, writers, connections = started
+        
+        self.stop_event.clear()
+        fetchers = []
+        for key, scraper, sort_method in self.listings:
+            self.progress[key] = ScrapeProgress(key)
+            fetchers.append(threading.Thread(
+                target=self._fetch_listing,
+                args=(key, scraper, sort_method, write_queue, progress_interval),
+                name=f"fetcher-{scraper.subreddit_name}-{sort_method}",
+                daemon=True
+            ))
+        
+        try:
+            for fetcher in fetchers:
+                fetcher.start()
+            # Join with a timeout so Ctrl+C still reaches the main thread
+            for fetcher in fetchers:
+                while fetcher.is_alive():
+                    fetcher.join(timeout=1.0)
+        except KeyboardInterrupt:
+            logger.info("Interrupted; stopping fetchers after their current post")
+            self.stop_event.set()
+            for fetcher in fetchers:
+                fetcher.join()
+        except Exception as e:
+            logger.error(f"Error during scheduled scraping: {e}")
+            self.stop_event.set()
+        finally:
+            lead.stop_writers(write_queue, writers, connections)
+            for scraper in self.scrapers.values():
+                scraper.close_connections()
+            self.log_progress()
+            logger.info("Scheduler finished")
+        
+        return {key: progress.summary() for key, progress in self.progress.items()}
+
+def main(resume: bool = False, record: bool = False, incremental: bool = False,
+         max_more_requests: Optional[int] = None, max_more_seconds: Optional[float] = None):
+    """
+    Main function to run the scraper.
+    
+    By default every post is scraped with its full comment tree. incremental and
+    the MoreComments budget are opt-in; comments left out by the budget are
+    fetched later by main_refresh().
+    """
     # Configuration
     POST_LIMIT = 100000  # Number of posts to scrape
     SORT_METHOD = 'hot'  # 'hot', 'new', 'top', 'rising'
     SUBREDDIT_NAME = 'mindfulness'
+    BATCH_SIZE = 500  # Comment rows per executemany call
+    PIPELINED = True  # Overlap Reddit fetches with MySQL writes
+    NUM_WRITERS = 2  # Writer threads in pipelined mode
+    scraper = RedditScraper(SUBREDDIT_NAME, batch_size=BATCH_SIZE,
+                            max_more_requests=max_more_requests, max_more_seconds=max_more_seconds)
+    record_path = ScrapeRecorder.default_path(SUBREDDIT_NAME) if record else None
+    scraper.run(limit=POST_LIMIT, sort_method=SORT_METHOD, pipelined=PIPELINED, num_writers=NUM_WRITERS,
+                incremental=incremental, resume=resume, record_path=record_path)
+
+def main_multi():
+    """Scrape all wellness subreddits in one process with a shared rate-limit budget."""
+    # Configuration
+    SUBREDDITS = ['mindfulness', 'Meditation', 'DecidingToBeBetter', 'GetDisciplined']
+    SORT_METHODS = ['hot', 'top']  # 'hot', 'new', 'top', 'rising'
+    POST_LIMIT = 1000  # Posts per subreddit listing
+    scheduler = MultiSubredditScheduler(SUBREDDITS, sort_methods=SORT_METHODS, limit=POST_LIMIT, incremental=True)
+    summaries = scheduler.run()
+    for summary in summaries.values():
+        logger.info(f"Final {summary}")
+
+def main_refresh():
+    """Fetch new comments for recent posts and complete skipped comment subtrees."""
+    # Configuration
+    SUBREDDIT_NAME = 'mindfulness'
+    MAX_AGE_DAYS = 7  # Posts older than this are considered settled
     scraper = RedditScraper(SUBREDDIT_NAME)
-    scraper.run(limit=POST_LIMIT, sort_method=SORT_METHOD)
+    
+    if not scraper.setup_reddit_connection() or not scraper.setup_database_connection():
+        return
+    
+    try:
+        scraper.refresh_comments(max_age_days=MAX_AGE_DAYS)
+        scraper.backfill_skipped_comments()
+    finally:
+        scraper.close_connections()
+
+def main_replay(paths: List[str]):
+    """Load recorded scrapes into the local database."""
+    NUM_WRITERS = 4  # Writer threads; replay is bound by MySQL, not the API
+    scraper = RedditScraper()
+    scraper.replay(paths, num_writers=NUM_WRITERS)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Scrape Reddit posts and comments into MySQL")
+    parser.add_argument('--multi', action='store_true', help='Scrape all configured subreddits interleaved')
+    parser.add_argument('--refresh', action='store_true', help='Fetch new comments for recent posts')
+    parser.add_argument('--resume', action='store_true', help='Continue from the last scrape checkpoint')
+    parser.add_argument('--record', action='store_true', help='Also write raw posts and comments to a .ndjson.gz file')
+    parser.add_argument('--replay', nargs='+', metavar='FILE', help='Ingest recorded files instead of scraping')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Skip posts whose comment count is unchanged since the last run')
+    parser.add_argument('--max-more-requests', type=int, metavar='N',
+                        help='MoreComments expansions per post; the rest is left for --refresh (default: unlimited)')
+    parser.add_argument('--max-more-seconds', type=float, metavar='S',
+                        help='Wall time budget for MoreComments expansion per post (default: unlimited)')
+    args = parser.parse_args()
+    
+    if args.replay:
+        main_replay(args.replay)
+    elif args.multi:
+        main_multi()
+    elif args.refresh:
+        main_refresh()
+    else:
+        main(resume=args.resume, record=args.record, incremental=args.incremental,
+             max_more_requests=args.max_more_requests, max_more_seconds=args.max_more_seconds)
\ No newline at end of file
@@ -18,9 +18,20 @@ CREATE TABLE IF NOT EXISTS posts (
     is_self BOOLEAN DEFAULT FALSE,
     selftext TEXT,
     permalink TEXT,
-    scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    -- Bumped whenever the scraper refreshes a row; watermark for incremental chunking
+    scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_subreddit (subreddit),
+    -- Keyset pagination in data_extractor.main_batch_processing
+    INDEX idx_posts_created_id (created_utc, id),
+    -- ORDER BY score DESC, created_utc DESC in the extractor and topic scripts
+    INDEX idx_posts_score_created (score, created_utc)
 );
 
+-- Existing databases:
+-- ALTER TABLE posts ADD INDEX idx_posts_created_id (created_utc, id);
+-- ALTER TABLE posts MODIFY scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
+-- (idx_posts_score_created: migrations/001_generated_columns_and_indexes.sql)
+
 -- Create comments table
 CREATE TABLE IF NOT EXISTS comments (
     id VARCHAR(20) PRIMARY KEY,
@@ -32,9 +43,181 @@ CREATE TABLE IF NOT EXISTS comments (
     parent_type ENUM('post', 'comment') DEFAULT 'post',
     parent_id VARCHAR(20),
     permalink TEXT,
-    scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    -- Stored so queries can filter and index on them instead of evaluating body per row
+    body_length INT AS (CHAR_LENGTH(TRIM(body))) STORED,
+    is_deleted BOOLEAN AS (body IS NULL OR body IN ('[deleted]', '[removed]')) STORED NOT NULL,
     FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE,
-    INDEX idx_post_id (post_id),
+    -- A post's comments, best first (data_extractor.fetch_comments_for_posts)
+    INDEX idx_comments_post_score (post_id, is_deleted, score DESC, created_utc),
+    -- High-value and top comments by score, with the length filter checked in the index
+    INDEX idx_comments_score (is_deleted, score, created_utc, body_length),
     INDEX idx_author (author),
-    INDEX idx_created_utc (created_utc)
-);
\ No newline at end of file
+    INDEX idx_created_utc (created_utc),
+    -- Covers the per-post MAX(scraped_at)/COUNT(*) in data_extractor.fetch_post_watermarks
+    INDEX idx_comments_post_scraped (post_id, scraped_at)
+);
+
+-- Existing databases:
+-- ALTER TABLE comments MODIFY scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+--     ADD INDEX idx_comments_post_scraped (post_id, scraped_at);
+-- then migrations/001_generated_columns_and_indexes.sql for body_length, is_deleted and the
+-- score indexes, and optionally migrations/002_partition_comments.sql to partition comments by year
+
+-- Newest post seen per subreddit listing, used by incremental scraping
+CREATE TABLE IF NOT EXISTS scrape_watermarks (
+    subreddit VARCHAR(50) NOT NULL,
+    sort_method VARCHAR(10) NOT NULL,
+    newest_created_utc TIMESTAMP NULL,
+    newest_fullname VARCHAR(20),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (subreddit, sort_method)
+);
+
+-- MoreComments left unexpanded by the per-post budget, completed by a backfill pass
+CREATE TABLE IF NOT EXISTS skipped_more_comments (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    post_id VARCHAR(20) NOT NULL,
+    parent_id VARCHAR(20),
+    more_count INT DEFAULT 0,
+    depth INT DEFAULT 0,
+    children MEDIUMTEXT,
+    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE,
+    INDEX idx_skipped_post_id (post_id)
+);
+
+-- Materialized corpus statistics, maintained by the triggers below and read by
+-- corpus_stats.py. Rebuild with `python corpus_stats.py --rebuild` to backfill
+-- an existing database or after deleting rows.
+
+-- One row once the tables below have been rebuilt from posts and comments.
+-- Installing the triggers clears it (see the end of this file), since rows
+-- stored before that are not counted; readers rebuild while it is missing.
+CREATE TABLE IF NOT EXISTS corpus_stats_state (
+    id TINYINT UNSIGNED PRIMARY KEY,
+    built_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Aggregates per table, spread over 16 slots (CONNECTION_ID() % 16) so parallel
+-- writers don't serialize on one row; readers sum the slots. Lengths and scores
+-- cover valid rows: every post, and comments that are not [deleted]/[removed].
+CREATE TABLE IF NOT EXISTS corpus_stats (
+    table_name VARCHAR(20) NOT NULL,
+    slot TINYINT UNSIGNED NOT NULL,
+    row_count BIGINT NOT NULL DEFAULT 0,
+    valid_count BIGINT NOT NULL DEFAULT 0,
+    length_sum BIGINT NOT NULL DEFAULT 0,
+    length_min INT,
+    length_max INT,
+    score_sum BIGINT NOT NULL DEFAULT 0,
+    score_sq_sum DECIMAL(38, 0) NOT NULL DEFAULT 0,
+    score_min INT,
+    score_max INT,
+    PRIMARY KEY (table_name, slot)
+);
+
+-- Posts plus valid comments per author
+CREATE TABLE IF NOT EXISTS author_activity (
+    author VARCHAR(50) PRIMARY KEY,
+    post_count INT NOT NULL DEFAULT 0,
+    comment_count INT NOT NULL DEFAULT 0,
+    activity_count INT AS (post_count + comment_count) STORED,
+    INDEX idx_author_activity (activity_count)
+);
+
+-- Stored comments per post
+CREATE TABLE IF NOT EXISTS post_comment_counts (
+    post_id VARCHAR(20) PRIMARY KEY,
+    comment_count INT NOT NULL DEFAULT 0,
+    INDEX idx_post_comment_count (comment_count)
+);
+
+DROP TRIGGER IF EXISTS posts_stats_after_insert;
+DROP TRIGGER IF EXISTS posts_stats_after_update;
+DROP TRIGGER IF EXISTS comments_stats_after_insert;
+
+DELIMITER $$
+
+CREATE TRIGGER posts_stats_after_insert AFTER INSERT ON posts
+FOR EACH ROW
+BEGIN
+    DECLARE post_length INT DEFAULT CHAR_LENGTH(NEW.title) + CHAR_LENGTH(COALESCE(NEW.selftext, ''));
+
+    INSERT INTO corpus_stats (table_name, slot, row_count, valid_count, length_sum, length_min, length_max,
+                              score_sum, score_sq_sum, score_min, score_max)
+    VALUES ('posts', CONNECTION_ID() % 16, 1, 1, COALESCE(post_length, 0), post_length, post_length,
+            COALESCE(NEW.score, 0), COALESCE(NEW.score * NEW.score, 0), NEW.score, NEW.score)
+    ON DUPLICATE KEY UPDATE
+        row_count = row_count + 1,
+        valid_count = valid_count + 1,
+        length_sum = length_sum + VALUES(length_sum),
+        length_min = LEAST(COALESCE(length_min, VALUES(length_min)), COALESCE(VALUES(length_min), length_min)),
+        length_max = GREATEST(COALESCE(length_max, VALUES(length_max)), COALESCE(VALUES(length_max), length_max)),
+        score_sum = score_sum + VALUES(score_sum),
+        score_sq_sum = score_sq_sum + VALUES(score_sq_sum),
+        score_min = LEAST(COALESCE(score_min, VALUES(score_min)), COALESCE(VALUES(score_min), score_min)),
+        score_max = GREATEST(COALESCE(score_max, VALUES(score_max)), COALESCE(VALUES(score_max), score_max));
+
+    IF NEW.author IS NOT NULL THEN
+        INSERT INTO author_activity (author, post_count) VALUES (NEW.author, 1)
+        ON DUPLICATE KEY UPDATE post_count = post_count + 1;
+    END IF;
+END$$
+
+-- The scraper refreshes scores of existing posts; sums stay exact, min/max only widen
+CREATE TRIGGER posts_stats_after_update AFTER UPDATE ON posts
+FOR EACH ROW
+BEGIN
+    IF NOT (NEW.score <=> OLD.score) THEN
+        INSERT INTO corpus_stats (table_name, slot, score_sum, score_sq_sum, score_min, score_max)
+        VALUES ('posts', CONNECTION_ID() % 16, COALESCE(NEW.score, 0) - COALESCE(OLD.score, 0),
+                COALESCE(NEW.score * NEW.score, 0) - COALESCE(OLD.score * OLD.score, 0), NEW.score, NEW.score)
+        ON DUPLICATE KEY UPDATE
+            score_sum = score_sum + VALUES(score_sum),
+            score_sq_sum = score_sq_sum + VALUES(score_sq_sum),
+            score_min = LEAST(COALESCE(score_min, VALUES(score_min)), COALESCE(VALUES(score_min), score_min)),
+            score_max = GREATEST(COALESCE(score_max, VALUES(score_max)), COALESCE(VALUES(score_max), score_max));
+    END IF;
+END$$
+
+CREATE TRIGGER comments_stats_after_insert AFTER INSERT ON comments
+FOR EACH ROW
+BEGIN
+    DECLARE is_valid BOOLEAN;
+    DECLARE body_length INT;
+    DECLARE valid_score INT;
+    SET is_valid = NEW.body IS NOT NULL AND NEW.body NOT IN ('[deleted]', '[removed]');
+    SET body_length = IF(is_valid, CHAR_LENGTH(NEW.body), NULL);
+    SET valid_score = IF(is_valid, NEW.score, NULL);
+
+    INSERT INTO corpus_stats (table_name, slot, row_count, valid_count, length_sum, length_min, length_max,
+                              score_sum, score_sq_sum, score_min, score_max)
+    VALUES ('comments', CONNECTION_ID() % 16, 1, is_valid, COALESCE(body_length, 0), body_length, body_length,
+            COALESCE(valid_score, 0), COALESCE(valid_score * valid_score, 0), valid_score, valid_score)
+    ON DUPLICATE KEY UPDATE
+        row_count = row_count + 1,
+        valid_count = valid_count + VALUES(valid_count),
+        length_sum = length_sum + VALUES(length_sum),
+        length_min = LEAST(COALESCE(length_min, VALUES(length_min)), COALESCE(VALUES(length_min), length_min)),
+        length_max = GREATEST(COALESCE(length_max, VALUES(length_max)), COALESCE(VALUES(length_max), length_max)),
+        score_sum = score_sum + VALUES(score_sum),
+        score_sq_sum = score_sq_sum + VALUES(score_sq_sum),
+        score_min = LEAST(COALESCE(score_min, VALUES(score_min)), COALESCE(VALUES(score_min), score_min)),
+        score_max = GREATEST(COALESCE(score_max, VALUES(score_max)), COALESCE(VALUES(score_max), score_max));
+
+    IF NEW.post_id IS NOT NULL THEN
+        INSERT INTO post_comment_counts (post_id, comment_count) VALUES (NEW.post_id, 1)
+        ON DUPLICATE KEY UPDATE comment_count = comment_count + 1;
+    END IF;
+
+    IF is_valid AND NEW.author IS NOT NULL THEN
+        INSERT INTO author_activity (author, comment_count) VALUES (NEW.author, 1)
+        ON DUPLICATE KEY UPDATE comment_count = comment_count + 1;
+    END IF;
+END$$
+
+DELIMITER ;
+
+-- Rows inserted before the triggers existed are missing from the stats tables
+DELETE FROM corpus_stats_state;
@@ -1,4 +1,3 @@
-import mysql.connector
 import pandas as pd
 import numpy as np
 from bertopic import BERTopic
@@ -7,7 +6,6 @@ from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.cluster import KMeans
 from umap import UMAP
 from hdbscan import HDBSCAN
-import re
 import logging
 from typing import List, Dict, Tuple
 import json
@@ -15,6 +13,8 @@ import pickle
 from datetime import datetime
 import random
 from collections import Counter
+from db import get_db_config, get_pool
+from text_normalizer import normalize, normalize_batch
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -36,7 +36,7 @@ class FastMindfulnessTopicDiscovery:
     def connect_to_database(self):
         """Connect to MySQL database."""
         try:
-            self.connection = mysql.connector.connect(**self.db_config)
+            self.connection = get_pool(self.db_config).get_connection()
             logger.info("Successfully connected to database")
             return True
         except Exception as e:
@@ -48,6 +48,7 @@ class FastMindfulnessTopicDiscovery:
         if self.connection and self.connection.is_connected():
             self.connection.close()
             logger.info("Database connection closed")
+        self.connection = None
 
     def extract_sample_content(self, top_comments: int = 10000, min_word_count: int = 5) -> List[Dict]:
         """Extract ALL posts plus top comments for comprehensive analysis."""
@@ -79,12 +80,11 @@ class FastMindfulnessTopicDiscovery:
             SELECT 
                 c.id, c.body as content, c.author, c.score, c.created_utc, c.post_id,
                 p.title as post_title, 'comment' as content_type,
-                CHAR_LENGTH(TRIM(c.body)) as text_length
+                c.body_length as text_length
             FROM comments c
             JOIN posts p ON c.post_id = p.id
-            WHERE c.body IS NOT NULL 
-            AND c.body NOT IN ('[deleted]', '[removed]')
-            AND CHAR_LENGTH(TRIM(c.body)) >= 20
+            WHERE c.is_deleted = 0
+            AND c.body_length >= 20
             ORDER BY c.score DESC
             LIMIT %s
         """
@@ -143,16 +143,7 @@ class FastMindfulnessTopicDiscovery:
 
     def clean_text_fast(self, text: str) -> str:
         """Fast text cleaning optimized for speed."""
-        if not text:
-            return ""
-
-        # Basic cleaning only - speed over perfection
-        text = re.sub(r'http[s]?://\S+', '', text)  # Remove URLs
-        text = re.sub(r'/[ur]/\w+', '', text)  # Remove Reddit mentions
-        text = re.sub(r'\s+', ' ', text)  # Normalize whitespace
-        text = text.strip()
-
-        return text
+        return normalize(text, 'fast')
 
     def prepare_documents_fast(self, content_data: List[Dict]) -> Tuple[List[str], List[Dict]]:
         """Fast document preparation."""
@@ -161,9 +152,8 @@ class FastMindfulnessTopicDiscovery:
         documents = []
         metadata = []
 
-        for item in content_data:
-            cleaned_text = self.clean_text_fast(item['text'])
-
+        cleaned_texts = normalize_batch((item['text'] for item in content_data), 'fast')
+        for item, cleaned_text in zip(content_data, cleaned_texts):
             if cleaned_text and len(cleaned_text.split()) >= 5:
                 documents.append(cleaned_text)
                 metadata.append(item)
@@ -481,15 +471,7 @@ def main():
     """Main function to run fast topic discovery."""
 
     # Database configuration
-    db_config = {
-        'host': 'localhost',
-        'port': 3306,
-        'database': 'reddit_mindfulness',
-        'user': 'root',
-        'password': 'admin123',
-        'charset': 'utf8mb4',
-        'use_unicode': True
-    }
+    db_config = get_db_config()
 
     # Fast processing configuration
     TOP_COMMENTS = 10000  # Process ALL posts + top 10K comments
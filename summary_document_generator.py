@@ -1,6 +1,5 @@
 import json
 import pickle
-import mysql.connector
 import requests
 import logging
 from datetime import datetime
@@ -9,6 +8,8 @@ from collections import defaultdict, Counter
 import re
 import os
 import glob
+from db import get_db_config, get_pool
+from corpus_stats import ensure_corpus_stats, get_top_authors
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -28,7 +29,7 @@ class MindfulnessSummaryGenerator:
     def connect_to_database(self):
         """Connect to MySQL database."""
         try:
-            self.connection = mysql.connector.connect(**self.db_config)
+            self.connection = get_pool(self.db_config).get_connection()
             logger.info("Successfully connected to database")
             return True
         except Exception as e:
@@ -40,6 +41,7 @@ class MindfulnessSummaryGenerator:
         if self.connection and self.connection.is_connected():
             self.connection.close()
             logger.info("Database connection closed")
+        self.connection = None
 
     def find_latest_files(self, prefix: str = "mindfulness_topics_fast") -> Dict[str, str]:
         """Automatically find the latest topic discovery files."""
@@ -108,6 +110,14 @@ class MindfulnessSummaryGenerator:
         cursor = self.connection.cursor(dictionary=True)
 
         try:
+            # Counts and top authors come from the materialized statistics (see corpus_stats.py)
+            stats = ensure_corpus_stats(self.connection)
+            post_count = stats['posts']['row_count']
+            comment_count = stats['comments']['valid_count']
+
+            # Get top authors by activity
+            top_authors = get_top_authors(self.connection, limit=10)
+
             # Get subreddit information
             cursor.execute("SELECT DISTINCT subreddit FROM posts WHERE subreddit IS NOT NULL")
             subreddits = [row['subreddit'] for row in cursor.fetchall()]
@@ -116,28 +126,6 @@ class MindfulnessSummaryGenerator:
             cursor.execute("SELECT MIN(created_utc) as earliest, MAX(created_utc) as latest FROM posts")
             date_range = cursor.fetchone()
 
-            # Get total counts
-            cursor.execute("SELECT COUNT(*) as post_count FROM posts")
-            post_count = cursor.fetchone()['post_count']
-
-            cursor.execute(
-                "SELECT COUNT(*) as comment_count FROM comments WHERE body NOT IN ('[deleted]', '[removed]')")
-            comment_count = cursor.fetchone()['comment_count']
-
-            # Get top authors by activity
-            cursor.execute("""
-                SELECT author, COUNT(*) as activity_count 
-                FROM (
-                    SELECT author FROM posts WHERE author IS NOT NULL
-                    UNION ALL
-                    SELECT author FROM comments WHERE author IS NOT NULL AND body NOT IN ('[deleted]', '[removed]')
-                ) combined
-                GROUP BY author
-                ORDER BY activity_count DESC
-                LIMIT 10
-            """)
-            top_authors = cursor.fetchall()
-
         except Exception as e:
             logger.error(f"Error getting database metadata: {e}")
             return {}
@@ -525,15 +513,7 @@ def main():
     """Main function to generate comprehensive summary document."""
 
     # Configuration
-    db_config = {
-        'host': 'localhost',
-        'port': 3306,
-        'database': 'reddit_mindfulness',
-        'user': 'root',
-        'password': 'admin123',
-        'charset': 'utf8mb4',
-        'use_unicode': True
-    }
+    db_config = get_db_config()
 
     # Initialize generator
     generator = MindfulnessSummaryGenerator(db_config)
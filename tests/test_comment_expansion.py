@@ -0,0 +1,101 @@
+"""
+Regression tests for MoreComments expansion in RedditScraper.
+
+Run with: python -m pytest tests
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+praw = pytest.importorskip('praw')
+pytest.importorskip('mysql.connector')
+pytest.importorskip('dotenv')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import reddit_scraper  # noqa: E402
+
+
+class FakeMoreComments(praw.models.MoreComments):
+    """MoreComments whose comments() returns a fixed flat list, as PRAW's does."""
+
+    def __init__(self, parent_id, kids, more_id='more'):
+        self.parent_id = parent_id
+        self.count = len(kids)
+        self.children = [kid.id for kid in kids if not isinstance(kid, praw.models.MoreComments)]
+        self.id = more_id
+        self.kids = kids
+        self.expanded = 0
+
+    def comments(self, update=True):
+        self.expanded += 1
+        return self.kids
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self, tokens=1):
+        self.acquired += tokens
+        return 0.0
+
+
+def comment(comment_id, parent_id, replies=()):
+    return SimpleNamespace(id=comment_id, parent_id=parent_id, body=f"body of {comment_id}", score=1,
+                           created_utc=1700000000, author='someone', permalink='/', replies=list(replies))
+
+
+def make_post():
+    nested = FakeMoreComments('t1_b1', [comment('b2', 't1_b1')], more_id='m4')
+    more = [
+        FakeMoreComments('t3_p', [comment('a1', 't3_p'), comment('a2', 't1_a1')], more_id='m1'),
+        FakeMoreComments('t3_p', [comment('b1', 't3_p'), nested], more_id='m2'),
+        FakeMoreComments('t1_top', [comment('c1', 't1_top')], more_id='m3'),
+    ]
+    top = comment('top', 't3_p', replies=[more[2]])
+    post = SimpleNamespace(id='p', score=10, comments=[top, more[0], more[1]])
+    return post, more + [nested]
+
+
+@pytest.fixture
+def scraper():
+    scraper = reddit_scraper.RedditScraper('test')
+    scraper.rate_limiter = CountingLimiter()
+    return scraper
+
+
+def test_unbounded_expansion_loads_every_more_comments(scraper):
+    post, more = make_post()
+    batch, skipped = scraper.expand_comment_forest(post)
+
+    assert sorted(batch.ids) == ['a1', 'a2', 'b1', 'b2', 'c1', 'top']
+    assert skipped == []
+    assert [m.expanded for m in more] == [1, 1, 1, 1]
+    # One token for the forest, one per MoreComments request
+    assert scraper.rate_limiter.acquired == 1 + len(more)
+
+
+def test_depth_comes_from_parent_ids(scraper):
+    post, _ = make_post()
+    batch, _ = scraper.expand_comment_forest(post)
+    depths = dict(zip(batch.ids, batch.columns['depth']))
+
+    assert depths == {'top': 0, 'a1': 0, 'a2': 1, 'b1': 0, 'b2': 1, 'c1': 1}
+
+
+def test_budget_records_unexpanded_more_comments(scraper):
+    scraper.max_more_requests = 1
+    post, more = make_post()
+    batch, skipped = scraper.expand_comment_forest(post)
+
+    assert sum(m.expanded for m in more) == 1
+    assert len(skipped) == 2
+    assert 'top' in batch.ids
+
+    backfill, still_skipped = scraper.expand_comment_forest(make_post()[0], unbounded=True)
+    assert still_skipped == []
+    assert len(backfill) == 6
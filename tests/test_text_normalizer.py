@@ -0,0 +1,71 @@
+"""
+text_normalizer must give the same output as the per-pattern re.sub chains it replaced.
+
+Run with: python -m pytest tests
+"""
+
+import os
+import random
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_normalizer import normalize, normalize_batch  # noqa: E402
+
+
+def topic_clean_reference(text):
+    """The previous MindfulnessTopicDiscovery.clean_text (same in summarize.py)."""
+    if not text:
+        return ""
+    text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
+    text = re.sub(r'/u/\w+', '', text)
+    text = re.sub(r'/r/\w+', '', text)
+    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
+    text = re.sub(r'\*([^*]+)\*', r'\1', text)
+    text = re.sub(r'\n+', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def fast_clean_reference(text):
+    """The previous FastMindfulnessTopicDiscovery.clean_text_fast."""
+    if not text:
+        return ""
+    text = re.sub(r'http[s]?://\S+', '', text)
+    text = re.sub(r'/[ur]/\w+', '', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+REFERENCES = {'topic': topic_clean_reference, 'fast': fast_clean_reference}
+
+TRICKY_TEXTS = [
+    "/r/u/x hi",
+    "see /u/https://x.com ok",
+    "/u//r/x http://a.b/*c* **bold *it***",
+    "https://x.com/r/Meditation and /r/https://y.org",
+]
+
+PIECES = ['/u/', '/r/', 'http://', 'https://', 'x.com', '*', '**', ' ', '\n', '\r\n', 'word', '_', '/', '(', '%2F']
+
+
+def random_texts(count, seed=7):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(PIECES) for _ in range(rng.randint(1, 20))) for _ in range(count)]
+
+
+@pytest.mark.parametrize('profile', sorted(REFERENCES))
+def test_matches_previous_cleaners(profile):
+    reference = REFERENCES[profile]
+    texts = TRICKY_TEXTS + random_texts(2000)
+
+    assert [normalize(text, profile) for text in texts] == [reference(text) for text in texts]
+    assert normalize_batch(texts, profile) == [reference(text) for text in texts]
+
+
+def test_reported_cases():
+    assert normalize("/r/u/x hi", 'topic') == '/r hi'
+    assert normalize("see /u/https://x.com ok", 'topic') == 'see /u/ ok'
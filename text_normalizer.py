@@ -0,0 +1,83 @@
+"""
+Shared text cleaning for chunking and topic modeling.
+
+Each profile applies the old per-pattern re.sub chain with precompiled
+patterns, in the same order, followed by whitespace collapsing with
+str.split/join. Passes are not merged into alternations: removing one match
+can create or break another (a URL after '/u/', or '/r/u/x'), so merging
+would change the output.
+
+    'chunk'  HierarchicalChunker: drop markdown asterisks and carriage returns
+    'topic'  Topic discovery: drop URLs and /u/ /r/ mentions, unwrap bold/italic
+    'fast'   Fast topic discovery: drop URLs and /u/ /r/ mentions
+
+Usage:
+    from text_normalizer import normalize, normalize_batch
+    normalize(text, 'topic')
+    normalize_batch(texts, 'chunk')
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+# The URL pattern the topic scripts have always used, kept so cleaned documents don't change
+URL_PATTERN = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+USER_MENTION_PATTERN = re.compile(r'/u/\w+')
+SUBREDDIT_MENTION_PATTERN = re.compile(r'/r/\w+')
+# Unwrapping bold can expose italics, as in ***text***
+BOLD_PATTERN = re.compile(r'\*\*([^*]+)\*\*')
+ITALIC_PATTERN = re.compile(r'\*([^*]+)\*')
+
+FAST_URL_PATTERN = re.compile(r'http[s]?://\S+')
+MENTION_PATTERN = re.compile(r'/[ur]/\w+')
+
+
+class TextNormalizer:
+    """A cleaning profile bound to its precompiled patterns."""
+
+    PROFILES = ('chunk', 'topic', 'fast')
+
+    def __init__(self, profile: str = 'chunk'):
+        if profile not in self.PROFILES:
+            raise ValueError(f"Unknown profile {profile!r}; expected one of {self.PROFILES}")
+        self.profile = profile
+
+    def __call__(self, text: Optional[str]) -> str:
+        """Clean one text. None and empty strings give ''."""
+        if not text:
+            return ""
+        if self.profile == 'chunk':
+            text = text.replace('*', '').replace('\r', '')
+        elif self.profile == 'topic':
+            text = SUBREDDIT_MENTION_PATTERN.sub('', USER_MENTION_PATTERN.sub('', URL_PATTERN.sub('', text)))
+            text = ITALIC_PATTERN.sub(r'\1', BOLD_PATTERN.sub(r'\1', text))
+        else:
+            text = MENTION_PATTERN.sub('', FAST_URL_PATTERN.sub('', text))
+        return ' '.join(text.split())
+
+    def batch(self, texts: Iterable[Optional[str]]) -> List[str]:
+        """Clean many texts."""
+        split = str.split
+        join = ' '.join
+        if self.profile == 'chunk':
+            return [join(split(text.replace('*', '').replace('\r', ''))) if text else "" for text in texts]
+        if self.profile == 'topic':
+            url, user, subreddit = URL_PATTERN.sub, USER_MENTION_PATTERN.sub, SUBREDDIT_MENTION_PATTERN.sub
+            bold, italic = BOLD_PATTERN.sub, ITALIC_PATTERN.sub
+            return [join(split(italic(r'\1', bold(r'\1', subreddit('', user('', url('', text)))))))
+                    if text else "" for text in texts]
+        url, mention = FAST_URL_PATTERN.sub, MENTION_PATTERN.sub
+        return [join(split(mention('', url('', text)))) if text else "" for text in texts]
+
+
+_NORMALIZERS: Dict[str, TextNormalizer] = {profile: TextNormalizer(profile) for profile in TextNormalizer.PROFILES}
+
+
+def normalize(text: Optional[str], profile: str = 'chunk') -> str:
+    """Clean one text with the named profile."""
+    return _NORMALIZERS[profile](text)
+
+
+def normalize_batch(texts: Iterable[Optional[str]], profile: str = 'chunk') -> List[str]:
+    """Clean many texts with the named profile."""
+    return _NORMALIZERS[profile].batch(texts)